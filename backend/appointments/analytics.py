@@ -0,0 +1,252 @@
+"""
+Doctor schedule utilization analytics.
+
+Appointments are loaded once as columnar NumPy arrays and every statistic is
+computed with array operations (bincount / reduceat / broadcasting) instead
+of a Python loop per appointment, which keeps a year of data fast.
+
+All times are wall-clock times in ``TIME_ZONE``, the same frame the booking
+serializer uses to compare against ``available_from``/``available_to``.  The
+UTC offset at the start of the range is used throughout, so DST changes
+inside the range are not accounted for.
+"""
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db import connection
+from django.db.models import Func, IntegerField
+from django.utils import timezone
+
+from .models import Appointment, Doctor
+
+SECONDS_PER_DAY = 24 * 60 * 60
+# longest range accepted from API clients
+MAX_RANGE = timedelta(days=3 * 366)
+# 1970-01-01 was a Thursday
+EPOCH_WEEKDAY = 3
+
+AppointmentArrays = namedtuple('AppointmentArrays', ['doctor_ids', 'starts'])
+DoctorArrays = namedtuple(
+    'DoctorArrays', ['ids', 'names', 'specializations', 'available_from', 'available_to', 'day_mask']
+)
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class EpochSeconds(Func):
+    """Whole seconds since the Unix epoch (UTC) of a datetime column, computed
+    by the database so no ``datetime`` object is built per row."""
+    output_field = IntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template='CAST(EXTRACT(EPOCH FROM %(expressions)s) AS BIGINT)',
+            **extra_context,
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)', **extra_context)
+
+
+def load_appointments(start, end):
+    """Booked (not rejected) appointments on days ``start`` <= day < ``end``.
+
+    ``starts`` are local wall-clock seconds since the epoch.
+    """
+    start_dt, end_dt = _aware(start), _aware(end)
+    offset = int(start_dt.utcoffset().total_seconds())
+    rows = (
+        Appointment.objects
+        .filter(appointment_date__gte=start_dt, appointment_date__lt=end_dt)
+        .exclude(status='Rejected')
+        .annotate(epoch=EpochSeconds('appointment_date'))
+        .values_list('doctor_id', 'epoch')
+        # arrays are unordered; skip the model's default ORDER BY
+        .order_by()
+    )
+    with connection.cursor() as cursor:
+        sql, params = rows.query.sql_with_params()
+        cursor.execute(sql, params)
+        # (doctor_id, epoch) pairs straight from the driver into one array
+        data = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+    return AppointmentArrays(data[:, 0].copy(), data[:, 1] + offset)
+
+
+def load_doctors():
+    doctors = list(Doctor.objects.order_by('id'))
+    day_mask = np.zeros((len(doctors), 7), dtype=bool)
+    for i, doctor in enumerate(doctors):
+        days = [d for d in doctor.available_days_list if 0 <= d <= 6]
+        # no days set means every day, as when booking
+        day_mask[i, days or slice(None)] = True
+
+    def hours(value):
+        if isinstance(value, str):
+            value = time.fromisoformat(value)
+        return value.hour + value.minute / 60 + value.second / 3600
+
+    return DoctorArrays(
+        np.array([d.id for d in doctors], dtype=np.int64),
+        [d.name for d in doctors],
+        [d.specialization for d in doctors],
+        np.array([hours(d.available_from) for d in doctors], dtype=np.float64),
+        np.array([hours(d.available_to) for d in doctors], dtype=np.float64),
+        day_mask,
+    )
+
+
+def _ratio(booked, available):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(available > 0, booked / available, 0.0)
+
+
+def compute_utilization(appointments, doctors, start, end, duration=Appointment.DURATION):
+    """Utilization, peak hours and availability gaps for ``start`` <= day < ``end``.
+
+    ``doctors.ids`` must be sorted.  Returns plain Python data ready to be
+    serialized as JSON.
+    """
+    if end <= start:
+        raise ValueError('end must be after start')
+    duration_hours = duration.total_seconds() / 3600
+    n_doctors = len(doctors.ids)
+
+    # calendar: every day in range, which week (from the Monday on or before
+    # start) and which weekday it is
+    week0 = np.datetime64(start - timedelta(days=start.weekday()), 'D')
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D'))
+    day_numbers = days.astype(np.int64)
+    weekdays = (day_numbers + EPOCH_WEEKDAY) % 7
+    day_weeks = (days - week0).astype(np.int64) // 7
+    n_weeks = int(day_weeks[-1]) + 1
+    week_starts = week0 + np.arange(n_weeks) * 7
+
+    # available hours: doctors x days, summed per week
+    hours_per_day = np.clip(doctors.available_to - doctors.available_from, 0, None)
+    available_daily = doctors.day_mask[:, weekdays] * hours_per_day[:, None]
+    first_day_of_week = np.flatnonzero(np.r_[True, day_weeks[1:] != day_weeks[:-1]])
+    available_weekly = np.add.reduceat(available_daily, first_day_of_week, axis=1)
+
+    # booked hours: appointments of known doctors within the range, binned
+    # by (doctor, week)
+    appt_days = appointments.starts // SECONDS_PER_DAY
+    doctor_index = np.searchsorted(doctors.ids, appointments.doctor_ids)
+    found = doctor_index < n_doctors
+    keep = np.zeros(len(doctor_index), dtype=bool)
+    keep[found] = doctors.ids[doctor_index[found]] == appointments.doctor_ids[found]
+    keep &= (appt_days >= day_numbers[0]) & (appt_days <= day_numbers[-1])
+    doctor_index = doctor_index[keep]
+    appt_seconds = appointments.starts[keep]
+    appt_days = appt_days[keep]
+    appt_weeks = (appt_days - week0.astype(np.int64)) // 7
+    appt_weekdays = (appt_days + EPOCH_WEEKDAY) % 7
+    appt_hours = (appt_seconds % SECONDS_PER_DAY) / 3600
+
+    booked_weekly = np.bincount(
+        doctor_index * n_weeks + appt_weeks, minlength=n_doctors * n_weeks
+    ).reshape(n_doctors, n_weeks) * duration_hours
+
+    # appointments that fall outside the doctor's configured availability
+    outside = (
+        ~doctors.day_mask[doctor_index, appt_weekdays]
+        | (appt_hours < doctors.available_from[doctor_index])
+        | (appt_hours > doctors.available_to[doctor_index])
+    )
+    outside_per_doctor = np.bincount(doctor_index[outside], minlength=n_doctors)
+
+    # peak hours: weekday x hour-of-day demand
+    demand = np.bincount(
+        appt_weekdays * 24 + appt_hours.astype(np.int64), minlength=7 * 24
+    ).reshape(7, 24)
+
+    # coverage: doctors working each weekday/hour; a gap is an hour the clinic
+    # is open (some doctor works) but no doctor of a specialization does
+    hour_starts = np.arange(24)
+    coverage = (
+        doctors.day_mask[:, :, None]
+        & (hour_starts[None, None, :] >= doctors.available_from[:, None, None])
+        & (hour_starts[None, None, :] + 1 <= doctors.available_to[:, None, None])
+    )
+    clinic_open = coverage.any(axis=0)
+    specializations, spec_index = np.unique(np.array(doctors.specializations, dtype=object), return_inverse=True)
+    spec_onehot = np.zeros((len(specializations), n_doctors))
+    spec_onehot[spec_index, np.arange(n_doctors)] = 1
+    spec_coverage = (spec_onehot @ coverage.reshape(n_doctors, 7 * 24)).reshape(-1, 7, 24)
+    booked_total = booked_weekly.sum(axis=1)
+    available_total = available_weekly.sum(axis=1)
+
+    week_labels = [str(week) for week in week_starts]
+    per_doctor = []
+    doctor_utilization = _ratio(booked_total, available_total)
+    weekly_utilization = _ratio(booked_weekly, available_weekly)
+    for i in range(n_doctors):
+        per_doctor.append({
+            'doctor_id': int(doctors.ids[i]),
+            'name': doctors.names[i],
+            'specialization': doctors.specializations[i],
+            'booked_hours': round(float(booked_total[i]), 2),
+            'available_hours': round(float(available_total[i]), 2),
+            'utilization': round(float(doctor_utilization[i]), 4),
+            'outside_availability': int(outside_per_doctor[i]),
+            'weekly': [
+                {
+                    'week': week_labels[w],
+                    'booked_hours': round(float(booked_weekly[i, w]), 2),
+                    'available_hours': round(float(available_weekly[i, w]), 2),
+                    'utilization': round(float(weekly_utilization[i, w]), 4),
+                }
+                for w in range(n_weeks)
+            ],
+        })
+
+    spec_booked = spec_onehot @ booked_total
+    spec_available = spec_onehot @ available_total
+    spec_utilization = _ratio(spec_booked, spec_available)
+    per_specialization = []
+    for s, name in enumerate(specializations):
+        gaps = np.argwhere(clinic_open & (spec_coverage[s] == 0))
+        per_specialization.append({
+            'specialization': name,
+            'booked_hours': round(float(spec_booked[s]), 2),
+            'available_hours': round(float(spec_available[s]), 2),
+            'utilization': round(float(spec_utilization[s]), 4),
+            'gaps': [{'weekday': int(d), 'hour': int(h)} for d, h in gaps],
+        })
+
+    flat_demand = demand.ravel()
+    busiest = np.argsort(flat_demand, kind='stable')[::-1][:5]
+    return {
+        'start': str(start),
+        'end': str(end),
+        'weeks': week_labels,
+        'doctors': per_doctor,
+        'specializations': per_specialization,
+        'peak_hours': {
+            'by_hour': demand.sum(axis=0).tolist(),
+            'by_weekday': demand.sum(axis=1).tolist(),
+            'busiest': [
+                {'weekday': int(i // 24), 'hour': int(i % 24), 'appointments': int(flat_demand[i])}
+                for i in busiest if flat_demand[i] > 0
+            ],
+        },
+    }
+
+
+def default_range():
+    """The current week plus the four before it, as (start, end) dates."""
+    monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+    return monday - timedelta(weeks=4), monday + timedelta(weeks=1)
+
+
+def utilization_report(start, end):
+    """Load appointments and doctors for the range and compute the report."""
+    return compute_utilization(load_appointments(start, end), load_doctors(), start, end)
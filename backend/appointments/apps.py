@@ -1,6 +1,16 @@
+import atexit
+
 from django.apps import AppConfig
+from django.core.signals import request_finished
 
 
 class AppointmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'appointments'
+
+    def ready(self):
+        from . import snapshots  # noqa: F401 (connects the rename receivers)
+        from .last_login import last_login_buffer
+        request_finished.connect(last_login_buffer.flush_if_due, dispatch_uid='last_login_flush')
+        # don't lose buffered logins on a clean shutdown
+        atexit.register(last_login_buffer.shutdown)
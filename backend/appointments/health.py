@@ -0,0 +1,200 @@
+"""
+Liveness and readiness probes.
+
+``liveness`` only says the process is answering requests.  ``readiness``
+checks what a request actually needs: database round-trip latency, how close
+the database is to ``max_connections`` (PostgreSQL only), unapplied
+migrations and the cache.  A load balancer should stop routing to a worker
+while readiness returns 503.
+
+Readiness results are kept in-process for ``HEALTH_READINESS_CACHE_SECONDS``
+so frequent probes don't add load.  Once that has run out the next probe
+re-checks while the others keep getting the last result, so a hung database
+never piles probes up behind it; queries are also bounded by
+``HEALTH_CHECK_TIMEOUT_SECONDS`` on PostgreSQL.
+
+The endpoints are public, so readiness only tells anonymous callers ``ok``
+or ``unavailable`` and logs what failed.  The full report (per-check
+latency, pending migrations, errors) is returned to requests carrying the
+``HEALTH_DETAIL_TOKEN`` setting in an ``X-Health-Token`` header.
+"""
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+@contextmanager
+def statement_timeout():
+    """Bound the queries run inside (PostgreSQL only), so a hung database fails
+    the check instead of hanging it."""
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    timeout_ms = int(getattr(settings, 'HEALTH_CHECK_TIMEOUT_SECONDS', 2) * 1000)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SET statement_timeout = %s', [timeout_ms])
+    except DatabaseError:
+        # the database check will report it
+        yield
+        return
+    try:
+        yield
+    finally:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('RESET statement_timeout')
+        except DatabaseError:
+            pass
+
+
+def check_database():
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    latency = _elapsed_ms(start)
+    limit = getattr(settings, 'HEALTH_DB_LATENCY_MS', 250)
+    return {'ok': latency <= limit, 'latency_ms': latency, 'limit_ms': limit}
+
+
+def check_connections():
+    """
+    Client connections in use against the slots open to them; ``None`` values
+    off PostgreSQL.
+
+    Background processes (autovacuum, WAL writer, replication) also appear in
+    ``pg_stat_activity`` but don't take connection slots from clients, and
+    ``superuser_reserved_connections`` of ``max_connections`` are only open to
+    superusers, so neither counts here.
+    """
+    if connection.vendor != 'postgresql':
+        return {'ok': True, 'in_use': None, 'max': None, 'saturation': None}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FILTER (WHERE backend_type = 'client backend'),"
+            " current_setting('max_connections')::int"
+            " - current_setting('superuser_reserved_connections')::int"
+            " FROM pg_stat_activity"
+        )
+        in_use, maximum = cursor.fetchone()
+    saturation = round(in_use / maximum, 3)
+    limit = getattr(settings, 'HEALTH_DB_SATURATION_LIMIT', 0.9)
+    return {'ok': saturation < limit, 'in_use': in_use, 'max': maximum, 'saturation': saturation}
+
+
+def check_migrations():
+    # the migration framework is only needed here, not at worker startup
+    from django.db.migrations.executor import MigrationExecutor
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return {'ok': not plan, 'pending': [f'{m.app_label}.{m.name}' for m, _ in plan]}
+
+
+def check_cache():
+    key = f'health:{uuid.uuid4().hex}'
+    start = time.perf_counter()
+    cache.set(key, 1, 10)
+    found = cache.get(key) == 1
+    cache.delete(key)
+    return {'ok': found, 'latency_ms': _elapsed_ms(start)}
+
+
+CHECKS = {
+    'database': check_database,
+    'connections': check_connections,
+    'migrations': check_migrations,
+    'cache': check_cache,
+}
+
+
+class ReadinessProbe:
+    def __init__(self, checks=CHECKS):
+        self.checks = checks
+        self._lock = threading.Condition()
+        self._result = None
+        self._checked_at = 0.0
+        self._refreshing = False
+
+    def reset(self):
+        with self._lock:
+            self._result = None
+
+    def run(self):
+        """The readiness report, re-checked at most once per cache interval.
+
+        Only one caller runs the checks at a time, without holding the lock;
+        the others get the previous report meanwhile, or wait for the first
+        one (up to ``HEALTH_CHECK_TIMEOUT_SECONDS``) if there is none yet.
+        """
+        ttl = getattr(settings, 'HEALTH_READINESS_CACHE_SECONDS', 5)
+        with self._lock:
+            fresh = self._result is not None and time.monotonic() - self._checked_at < ttl
+            if fresh or (self._refreshing and self._result is not None):
+                return self._result
+            if self._refreshing:
+                self._lock.wait_for(lambda: not self._refreshing,
+                                    getattr(settings, 'HEALTH_CHECK_TIMEOUT_SECONDS', 2))
+                return self._result or {'status': 'unavailable', 'checked_at': None, 'checks': {}}
+            self._refreshing = True
+        try:
+            result = self._check()
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._lock.notify_all()
+        with self._lock:
+            self._result, self._checked_at = result, time.monotonic()
+        return result
+
+    def _check(self):
+        results = {}
+        with statement_timeout():
+            for name, check in self.checks.items():
+                start = time.perf_counter()
+                try:
+                    results[name] = check()
+                except Exception as exc:
+                    results[name] = {'ok': False, 'error': str(exc) or exc.__class__.__name__}
+                results[name]['duration_ms'] = _elapsed_ms(start)
+        ready = all(result['ok'] for result in results.values())
+        if not ready:
+            logger.warning('Not ready: %s', {name: r for name, r in results.items() if not r['ok']})
+        return {
+            'status': 'ok' if ready else 'unavailable',
+            'checked_at': timezone.now().isoformat(),
+            'checks': results,
+        }
+
+
+readiness_probe = ReadinessProbe()
+
+
+def liveness(request):
+    return JsonResponse({'status': 'ok'})
+
+
+def _show_details(request):
+    token = getattr(settings, 'HEALTH_DETAIL_TOKEN', None)
+    return bool(token) and constant_time_compare(request.headers.get('X-Health-Token', ''), token)
+
+
+def readiness(request):
+    report = readiness_probe.run()
+    body = report if _show_details(request) else {'status': report['status']}
+    return JsonResponse(body, status=200 if report['status'] == 'ok' else 503)
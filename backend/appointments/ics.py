@@ -0,0 +1,184 @@
+"""
+iCalendar (RFC 5545) feeds built from ``Appointment`` rows.
+
+Feeds are streamed straight from a database iterator.  Each VEVENT is cached
+under the appointment's id and ``updated_at``, so an unchanged appointment
+is rendered once and then served from the cache, and the whole feed carries
+an ETag derived from ``Max(updated_at)`` so calendar clients that poll with
+``If-None-Match`` get a 304 without any rendering at all.
+
+Calendar clients subscribe to a URL and can't send an ``Authorization``
+header, so feeds are addressed by a token signed with ``django.core.signing``
+that names the doctor or user and the version of their ``CalendarFeedKey``.
+Rotating the key revokes every URL issued before.
+"""
+import hashlib
+from datetime import timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db.models import Count, F, Max
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+
+from .models import Appointment, CalendarFeedKey, Doctor
+
+CHUNK_SIZE = 500
+# cache alias for rendered VEVENTs, sized for whole feeds (see CACHES)
+ICS_CACHE = 'ics'
+FEED_TOKEN_SALT = 'appointments.calendar-feed'
+
+EVENT_STATUS = {
+    'Pending': 'TENTATIVE',
+    'Approved': 'CONFIRMED',
+    'Rejected': 'CANCELLED',
+}
+
+
+def escape_text(value):
+    return (
+        value.replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Fold a content line at 75 octets, continuation lines start with a space."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # never split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_vevent(appointment):
+    start = appointment.appointment_date
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:appointment-{appointment.pk}@online-medical',
+        f'DTSTAMP:{format_datetime(appointment.updated_at)}',
+        f'DTSTART:{format_datetime(start)}',
+        f'DTEND:{format_datetime(start + Appointment.DURATION)}',
+        f'SUMMARY:{escape_text(f"{appointment.user_name} with Dr. {appointment.doctor_name}")}',
+        f'DESCRIPTION:{escape_text(appointment.doctor_specialization)}',
+        f'STATUS:{EVENT_STATUS.get(appointment.status, "TENTATIVE")}',
+        'END:VEVENT',
+    ]
+    return ''.join(fold(line) for line in lines)
+
+
+def vevent_cache_key(appointment):
+    return f'ics:vevent:{appointment.pk}:{appointment.updated_at.timestamp()}'
+
+
+def feed_version(queryset):
+    """ETag for a feed: changes whenever a row is added, removed or updated."""
+    stats = queryset.aggregate(latest=Max('updated_at'), total=Count('id'))
+    latest = stats['latest'].timestamp() if stats['latest'] else 0
+    digest = hashlib.sha1(f"{latest}:{stats['total']}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def iter_vevents(queryset):
+    """Yield rendered VEVENTs, fetching and rendering ``CHUNK_SIZE`` rows at a time."""
+    cache = caches[ICS_CACHE]
+    timeout = getattr(settings, 'ICS_VEVENT_CACHE_SECONDS', 24 * 60 * 60)
+    rows = queryset.iterator(chunk_size=CHUNK_SIZE)
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return
+        keys = [vevent_cache_key(appointment) for appointment in chunk]
+        cached = cache.get_many(keys)
+        rendered = {}
+        for key, appointment in zip(keys, chunk):
+            if key not in cached:
+                rendered[key] = render_vevent(appointment)
+        if rendered:
+            cache.set_many(rendered, timeout)
+        for key in keys:
+            yield cached.get(key) or rendered[key]
+
+
+def iter_calendar(queryset, name):
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold('PRODID:-//Online Medical//Appointments//EN')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold(f'X-WR-CALNAME:{escape_text(name)}')
+    yield from iter_vevents(queryset)
+    yield fold('END:VCALENDAR')
+
+
+def calendar_response(request, queryset, name):
+    """Stream ``queryset`` as an ``.ics`` feed, or 304 if the client is current."""
+    queryset = queryset.exclude(status='Rejected')
+    etag = feed_version(queryset)
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    queryset = queryset.only(
+        'id', 'appointment_date', 'status', 'updated_at',
+        'user_name', 'doctor_name', 'doctor_specialization',
+    ).order_by('appointment_date', 'id')
+    response = StreamingHttpResponse(iter_calendar(queryset, name), content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Content-Disposition'] = 'inline; filename="appointments.ics"'
+    return response
+
+
+def feed_key(doctor=None, user=None):
+    """The owner's feed key, or ``None`` if no URL has been issued yet."""
+    return CalendarFeedKey.objects.filter(doctor=doctor, user=user).first()
+
+
+def feed_token(key):
+    owner = {'d': key.doctor_id} if key.doctor_id else {'u': key.user_id}
+    return signing.dumps({**owner, 'v': key.version}, salt=FEED_TOKEN_SALT)
+
+
+def rotate_feed_key(doctor=None, user=None):
+    """Issue a feed URL, revoking every one issued before (the first call
+    creates the key).  Returns the key with the new version."""
+    key, created = CalendarFeedKey.objects.get_or_create(doctor=doctor, user=user)
+    if not created:
+        CalendarFeedKey.objects.filter(pk=key.pk).update(version=F('version') + 1)
+        key.refresh_from_db(fields=['version'])
+    return key
+
+
+def feed_for_token(token):
+    """The (appointments, calendar name) a feed token grants, or ``None`` if the
+    token is forged, malformed or revoked."""
+    try:
+        payload = signing.loads(token, salt=FEED_TOKEN_SALT)
+        version = int(payload['v'])
+        if 'd' in payload:
+            doctor = Doctor.objects.filter(
+                pk=int(payload['d']), calendar_feed_key__version=version
+            ).only('id', 'name').first()
+            return (doctor.appointments.all(), f'Dr. {doctor.name}') if doctor else None
+        if CalendarFeedKey.objects.filter(user_id=int(payload['u']), version=version).exists():
+            return Appointment.objects.filter(user_id=int(payload['u'])), 'My appointments'
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        pass
+    return None
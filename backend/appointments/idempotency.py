@@ -0,0 +1,208 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+from .lru import LRUCache
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def request_fingerprint(data):
+    """Keyed hash of a request payload.
+
+    Payloads can hold passwords (``/api/register/``), so the hash is an HMAC
+    under ``SECRET_KEY`` rather than a plain digest that could be brute-forced
+    from a copy of the table.
+    """
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return salted_hmac('appointments.idempotency', payload, algorithm='sha256').hexdigest()
+
+
+def request_scope(request):
+    """Who sent a key and to which endpoint.  Anonymous clients are told apart
+    by address (as DRF's throttles do) so two of them can't pick the same key."""
+    if request.user and request.user.is_authenticated:
+        client = request.user.pk
+    else:
+        client = f'anon:{BaseThrottle().get_ident(request)}'
+    return f'user:{client}:{request.path}'[:255]
+
+
+class IdempotencyStore:
+    """Stores the response to each ``Idempotency-Key`` so retries replay it.
+
+    Completed responses live in the ``IdempotencyKey`` table for
+    ``IDEMPOTENCY_KEY_TTL_SECONDS`` with an in-process LRU in front, so a
+    retry served by the same worker costs no query at all.  The unique
+    (scope, key) constraint decides which of several concurrent duplicates
+    runs; the others get 409 until it has finished, or until its claim is
+    older than ``IDEMPOTENCY_LEASE_SECONDS`` and a retry takes it over.
+
+    The handler and storing its response share one transaction that also
+    locks the claim, so either both commit or neither does: a retry can never
+    find the handler's rows without the stored response, and one that takes
+    over a claim still being worked on waits for that transaction to finish.
+    """
+
+    def __init__(self):
+        self._front = LRUCache(
+            getattr(settings, 'IDEMPOTENCY_CACHE_SIZE', 10000),
+            ttl=self.ttl.total_seconds(),
+        )
+
+    @property
+    def ttl(self):
+        return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL_SECONDS', 24 * 60 * 60))
+
+    @property
+    def lease(self):
+        # how long a request may run before a retry treats it as abandoned
+        return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LEASE_SECONDS', 60))
+
+    def clear_front(self):
+        self._front.clear()
+
+    def run(self, request, key, handler):
+        """Return the stored response for ``key`` or run ``handler`` and store its result."""
+        if len(key) > 255:
+            return Response({'detail': f'{HEADER} must be at most 255 characters.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        scope = request_scope(request)
+        fingerprint = request_fingerprint(request.data)
+
+        stored = self._front.get((scope, key))
+        if stored is not None:
+            return self._replay(fingerprint, *stored)
+        existing = self._existing(scope, key)
+        if existing is not None:
+            record = self._take_over(existing, fingerprint)
+            if record is None:
+                return self._replay_record(scope, key, fingerprint, existing)
+        else:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        scope=scope, key=key, fingerprint=fingerprint,
+                        expires_at=timezone.now() + self.ttl,
+                    )
+            except IntegrityError:
+                # a concurrent duplicate claimed the key between our read and insert
+                return self._replay_record(scope, key, fingerprint, self._existing(scope, key))
+
+        try:
+            with transaction.atomic():
+                if not self._hold(record):
+                    # our lease ran out before we started and a retry took over
+                    return Response({'detail': f'A request with this {HEADER} is already in progress.'},
+                                    status=status.HTTP_409_CONFLICT)
+                response = handler()
+                if response.status_code >= 500:
+                    transaction.set_rollback(True)
+                else:
+                    self._store(record, response)
+        except Exception:
+            # nothing the handler did was kept; let the client retry with the same key
+            self._release(record)
+            raise
+        if response.status_code >= 500:
+            self._release(record)
+            return response
+
+        self._front.set((scope, key), (fingerprint, response.status_code, response.data))
+        return response
+
+    def _hold(self, record):
+        """Lock our claim for the rest of the transaction, if it is still ours."""
+        return IdempotencyKey.objects.select_for_update().filter(
+            pk=record.pk, status_code__isnull=True, created_at=record.created_at
+        ).exists()
+
+    def _store(self, record, response):
+        record.status_code = response.status_code
+        record.response_body = response.data
+        record.save(update_fields=['status_code', 'response_body'])
+
+    def _release(self, record):
+        IdempotencyKey.objects.filter(
+            pk=record.pk, status_code__isnull=True, created_at=record.created_at
+        ).delete()
+
+    def _existing(self, scope, key):
+        record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if record is not None and record.expires_at <= timezone.now():
+            record.delete()
+            return None
+        return record
+
+    def _take_over(self, record, fingerprint):
+        """Claim a key whose first request never finished (e.g. the worker died)
+        once its lease has run out.  Returns the claimed record or ``None``."""
+        if record.status_code is not None or record.fingerprint != fingerprint:
+            return None
+        now = timezone.now()
+        if record.created_at > now - self.lease:
+            return None
+        # created_at doubles as the claim time; only one retry can move it on,
+        # and never once a response is stored (the update waits on the lock a
+        # running request holds, then re-checks both conditions)
+        claimed = IdempotencyKey.objects.filter(
+            pk=record.pk, status_code__isnull=True, created_at=record.created_at
+        ).update(created_at=now, expires_at=now + self.ttl)
+        if not claimed:
+            return None
+        record.created_at, record.expires_at = now, now + self.ttl
+        return record
+
+    def _replay_record(self, scope, key, fingerprint, record):
+        if record is None or record.status_code is None:
+            return Response({'detail': f'A request with this {HEADER} is already in progress.'},
+                            status=status.HTTP_409_CONFLICT)
+        stored = (record.fingerprint, record.status_code, record.response_body)
+        self._front.set((scope, key), stored)
+        return self._replay(fingerprint, *stored)
+
+    def _replay(self, fingerprint, stored_fingerprint, status_code, body):
+        if fingerprint != stored_fingerprint:
+            return Response({'detail': f'{HEADER} was already used for a different request.'},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        return Response(body, status=status_code, headers={'Idempotent-Replayed': 'true'})
+
+    def purge_expired(self):
+        """Delete expired keys.  Returns the count."""
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+idempotency_store = IdempotencyStore()
+
+
+class IdempotentCreateMixin:
+    """For create views: honour an ``Idempotency-Key`` header on POST.
+
+    The first request with a key runs normally; its response (including a
+    validation error) is stored, and later requests with the same key and
+    payload get it back without running validation or any INSERT again.
+    """
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return super().post(request, *args, **kwargs)
+
+        def handler():
+            try:
+                return super(IdempotentCreateMixin, self).post(request, *args, **kwargs)
+            except ValidationError as exc:
+                # invalid input stays invalid, so the 400 is worth storing too
+                return self.handle_exception(exc)
+
+        return idempotency_store.run(request, key, handler)
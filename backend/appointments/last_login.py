@@ -0,0 +1,120 @@
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
+from django.db.models import Case, DateTimeField, Q, Value, When
+from django.utils import timezone
+
+# users per UPDATE; each one adds a few parameters (SQLite allows 999)
+BATCH_SIZE = 100
+
+
+class LastLoginBuffer:
+    """Write-behind buffer for ``User.last_login``.
+
+    Logins only record a timestamp in memory.  Pending timestamps are written
+    in batched UPDATEs once ``LAST_LOGIN_FLUSH_SIZE`` users are pending or
+    ``LAST_LOGIN_FLUSH_SECONDS`` have passed, checked after each request has
+    been answered (``request_finished``) and by a background thread every
+    ``LAST_LOGIN_FLUSH_SECONDS`` so an idle worker doesn't hold them, and
+    once more when the process exits.
+
+    Each worker has its own buffer, so a write only moves ``last_login``
+    forward: a worker flushing an older login never overwrites a newer one
+    another worker already wrote.
+
+    With ``LAST_LOGIN_BUFFERED = False`` (the test runner sets it) every
+    login is written immediately instead.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        # serialises flushes so an older batch never lands after a newer one
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def record(self, user_id, when=None):
+        when = when or timezone.now()
+        if not getattr(settings, 'LAST_LOGIN_BUFFERED', True):
+            self._write({user_id: when})
+            return
+        with self._lock:
+            current = self._pending.get(user_id)
+            if current is None or when > current:
+                self._pending[user_id] = when
+            if self._timer is None:
+                # started on first use rather than at import, so it runs in
+                # the worker process and not in a parent that forks workers
+                self._timer = threading.Thread(target=self._run_timer, name='last-login-flush', daemon=True)
+                self._timer.start()
+
+    def clear(self):
+        """Drop pending timestamps without writing them."""
+        with self._lock:
+            self._pending = {}
+
+    def flush_if_due(self, **kwargs):
+        """``request_finished`` receiver: flush when over the size or age threshold."""
+        if not self._pending:
+            return
+        due = (
+            len(self._pending) >= getattr(settings, 'LAST_LOGIN_FLUSH_SIZE', 500)
+            or time.monotonic() - self._last_flush >= getattr(settings, 'LAST_LOGIN_FLUSH_SECONDS', 10)
+        )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write all pending timestamps now.  Returns the number of users written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+            try:
+                self._write(pending)
+            except Exception:
+                # keep the timestamps for the next attempt
+                for pk, when in pending.items():
+                    self.record(pk, when)
+                raise
+            return len(pending)
+
+    def _write(self, pending):
+        items = list(pending.items())
+        for start in range(0, len(items), BATCH_SIZE):
+            batch = items[start:start + BATCH_SIZE]
+            when = Case(*[When(pk=pk, then=Value(ts)) for pk, ts in batch], output_field=DateTimeField())
+            (
+                User.objects
+                .filter(pk__in=[pk for pk, _ in batch])
+                .filter(Q(last_login__isnull=True) | Q(last_login__lt=when))
+                .update(last_login=when)
+            )
+
+    def _run_timer(self):
+        while True:
+            time.sleep(getattr(settings, 'LAST_LOGIN_FLUSH_SECONDS', 10))
+            try:
+                self.flush_if_due()
+            except DatabaseError as exc:
+                sys.stderr.write(f'last_login: background flush failed, will retry: {exc}\n')
+            finally:
+                # this thread's own connection; don't hold it open while idle
+                connection.close()
+
+    def shutdown(self):
+        """``atexit`` hook: final flush, reporting rather than raising on failure."""
+        try:
+            self.flush()
+        except DatabaseError as exc:
+            sys.stderr.write(f'last_login: dropped {len(self._pending)} buffered timestamp(s): {exc}\n')
+
+
+last_login_buffer = LastLoginBuffer()
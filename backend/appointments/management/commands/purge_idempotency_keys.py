@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from appointments.idempotency import idempotency_store
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses that have expired.'
+
+    def handle(self, *args, **options):
+        deleted = idempotency_store.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired idempotency key(s)'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from appointments.revocation import revocation_store
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh token records whose tokens have expired anyway.'
+
+    def handle(self, *args, **options):
+        deleted = revocation_store.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired revoked token(s)'))
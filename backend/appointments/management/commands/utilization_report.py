@@ -0,0 +1,49 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments import analytics
+
+
+class Command(BaseCommand):
+    help = 'Print doctor and specialization utilization, peak hours and availability gaps.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='first day (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, help='day after the last day (YYYY-MM-DD)')
+        parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+
+    def handle(self, *args, **options):
+        start, end = analytics.default_range()
+        start = options['start'] or start
+        end = options['end'] or end
+        if end <= start:
+            raise CommandError('--end must be after --start')
+
+        report = analytics.utilization_report(start, end)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f'Utilization {report["start"]} to {report["end"]} (end exclusive)\n')
+        self.stdout.write(f'{"Doctor":<30} {"Specialization":<20} {"Booked h":>9} {"Avail h":>9} {"Util":>7} {"Outside":>8}')
+        for row in report['doctors']:
+            self.stdout.write(
+                f'{row["name"][:30]:<30} {row["specialization"][:20]:<20} {row["booked_hours"]:>9.1f} '
+                f'{row["available_hours"]:>9.1f} {row["utilization"]:>7.1%} {row["outside_availability"]:>8}'
+            )
+        self.stdout.write('')
+        self.stdout.write(f'{"Specialization":<30} {"Booked h":>9} {"Avail h":>9} {"Util":>7} {"Gap hours":>10}')
+        for row in report['specializations']:
+            self.stdout.write(
+                f'{row["specialization"][:30]:<30} {row["booked_hours"]:>9.1f} {row["available_hours"]:>9.1f} '
+                f'{row["utilization"]:>7.1%} {len(row["gaps"]):>10}'
+            )
+        self.stdout.write('')
+        weekdays = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+        busiest = ', '.join(
+            f'{weekdays[p["weekday"]]} {p["hour"]:02d}:00 ({p["appointments"]})'
+            for p in report['peak_hours']['busiest']
+        )
+        self.stdout.write(f'Peak hours: {busiest or "no appointments"}')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.snapshots import drifted, resync_drifted
+
+
+class Command(BaseCommand):
+    help = 'Check that appointment doctor/user name snapshots match the related rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='rewrite drifted snapshots')
+        parser.add_argument('--show', type=int, default=10, help='how many drifted ids to list')
+
+    def handle(self, *args, **options):
+        count = drifted().count()
+        if not count:
+            self.stdout.write(self.style.SUCCESS('All appointment snapshots are in sync'))
+            return
+        ids = list(drifted().order_by('id').values_list('id', flat=True)[:options['show']])
+        self.stdout.write(f'{count} appointment(s) with drifted snapshots, e.g. {ids}')
+        if not options['fix']:
+            raise CommandError('Snapshots have drifted; run with --fix to repair them')
+        fixed = resync_drifted()
+        self.stdout.write(self.style.SUCCESS(f'Fixed {fixed} appointment(s)'))
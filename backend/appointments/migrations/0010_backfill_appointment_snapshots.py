@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import Max, Min, OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+
+def backfill_snapshots(apps, schema_editor):
+    # one short UPDATE (and transaction) per primary-key range, so a large
+    # table is never locked as a whole; the columns were added empty in 0007
+    Appointment = apps.get_model('appointments', 'Appointment')
+    Doctor = apps.get_model('appointments', 'Doctor')
+    User = apps.get_model('auth', 'User')
+    doctors = Doctor.objects.filter(pk=OuterRef('doctor_id'))
+    users = User.objects.filter(pk=OuterRef('user_id'))
+    bounds = Appointment.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        Appointment.objects.filter(id__gte=start, id__lt=start + BATCH_SIZE, user_name='').update(
+            doctor_name=Subquery(doctors.values('name')[:1]),
+            doctor_specialization=Subquery(doctors.values('specialization')[:1]),
+            user_name=Subquery(users.values('username')[:1]),
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('appointments', '0009_calendar_feed_keys'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
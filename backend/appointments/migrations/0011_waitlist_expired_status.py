@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0010_backfill_appointment_snapshots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='waitlistentry',
+            name='status',
+            field=models.CharField(choices=[('Waiting', 'Waiting'), ('Promoted', 'Promoted'), ('Expired', 'Expired')], default='Waiting', max_length=20),
+        ),
+    ]
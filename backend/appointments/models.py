@@ -1,5 +1,8 @@
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 
 
 class Doctor(models.Model):
@@ -54,6 +57,10 @@ class Appointment(models.Model):
         ('Approved', 'Approved'),
         ('Rejected', 'Rejected'),
     ]
+
+    # bookings are for a single time; this is how long each one blocks the
+    # doctor's calendar
+    DURATION = timedelta(minutes=30)
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='appointments')
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointments')
@@ -61,9 +68,152 @@ class Appointment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # snapshots of the related names so reads need no join; kept in sync on
+    # renames by appointments/snapshots.py
+    doctor_name = models.CharField(max_length=200, blank=True, default='')
+    doctor_specialization = models.CharField(max_length=200, blank=True, default='')
+    user_name = models.CharField(max_length=150, blank=True, default='')
+
+    SNAPSHOT_FIELDS = ['doctor_name', 'doctor_specialization', 'user_name']
 
     def __str__(self):
-        return f"Appointment {self.id} - {self.user.username} with Dr. {self.doctor.name}"
+        return f"Appointment {self.id} - {self.user_name} with Dr. {self.doctor_name}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # admin changelist: newest first, optionally by status, and
+            # appointment date ranges
+            models.Index(fields=['-created_at', '-id'], name='appointment_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='appointment_status_idx'),
+            models.Index(fields=['appointment_date'], name='appointment_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # copy names from relations that are loaded anyway (e.g. a doctor
+        # passed to the serializer) or when there is no snapshot yet
+        before = [getattr(self, f) for f in self.SNAPSHOT_FIELDS]
+        if Appointment.doctor.is_cached(self) or not self.doctor_name:
+            self.doctor_name = self.doctor.name
+            self.doctor_specialization = self.doctor.specialization
+        if Appointment.user.is_cached(self) or not self.user_name:
+            self.user_name = self.user.username
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and before != [getattr(self, f) for f in self.SNAPSHOT_FIELDS]:
+            kwargs['update_fields'] = {*update_fields, *self.SNAPSHOT_FIELDS}
+        super().save(*args, **kwargs)
+
+
+class WaitlistEntry(models.Model):
+    """A user's request for the next freed slot with a doctor within a time window.
+
+    Entries form a per-doctor priority queue: higher ``priority`` first, then
+    first-come first-served by ``created_at``.
+    """
+
+    WAITING = 'Waiting'
+    PROMOTED = 'Promoted'
+    # the window passed without a slot coming free
+    EXPIRED = 'Expired'
+    STATUS_CHOICES = [
+        (WAITING, 'Waiting'),
+        (PROMOTED, 'Promoted'),
+        (EXPIRED, 'Expired'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='waitlist_entries')
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField()
+    priority = models.PositiveSmallIntegerField(default=0, help_text='Higher values are promoted first')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=WAITING)
+    # the appointment created for this entry once it has been promoted
+    appointment = models.OneToOneField(
+        Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Waitlist {self.id} - user {self.user_id} for doctor {self.doctor_id}"
+
+    class Meta:
+        ordering = ['-priority', 'created_at', 'id']
+        indexes = [
+            # the queue itself: only waiting entries, already in promotion order,
+            # so picking the next waiter is an index range scan that stops at the
+            # first entry whose window covers the freed slot
+            models.Index(
+                fields=['doctor', '-priority', 'created_at', 'id'],
+                condition=models.Q(status='Waiting'),
+                name='waitlist_queue_idx',
+            ),
+        ]
+
+
+class RevokedToken(models.Model):
+    """JTI of a refresh token that can no longer be used.
+
+    Rows are written on rotation and logout and only need to outlive the token
+    itself, so anything past ``expires_at`` can be purged (see the
+    ``purge_revoked_tokens`` management command).
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Revoked token {self.jti}"
+
+
+class IdempotencyKey(models.Model):
+    """Outcome of a create request sent with an ``Idempotency-Key`` header.
+
+    ``status_code`` stays empty while the first request is still running.
+    Rows past ``expires_at`` can be purged (``purge_idempotency_keys``).
+    """
+    # who sent the key and to which endpoint, e.g. "user:12:/api/appointments/"
+    scope = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    # hash of the request payload, so a key can't be reused for different data
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Idempotency key {self.key} ({self.scope})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key'),
+        ]
+
+
+class CalendarFeedKey(models.Model):
+    """Current version of a doctor's or a user's calendar subscription URL.
+
+    Feed URLs carry a token signed with this ``version`` (see
+    ``appointments.ics``); bumping it revokes every URL issued before.
+    """
+    doctor = models.OneToOneField(
+        Doctor, null=True, blank=True, on_delete=models.CASCADE, related_name='calendar_feed_key'
+    )
+    user = models.OneToOneField(
+        User, null=True, blank=True, on_delete=models.CASCADE, related_name='calendar_feed_key'
+    )
+    version = models.PositiveIntegerField(default=1)
+    rotated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        owner = f"Dr. {self.doctor_id}" if self.doctor_id else f"user {self.user_id}"
+        return f"Calendar feed key for {owner} (v{self.version})"
+
+    class Meta:
+        constraints = [
+            # a key belongs to exactly one doctor or one user
+            models.CheckConstraint(
+                check=models.Q(doctor__isnull=True) ^ models.Q(user__isnull=True),
+                name='calendar_feed_key_owner',
+            ),
+        ]
@@ -0,0 +1,157 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .lru import LRUCache
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings.
+
+    ``in`` never gives a false negative, so a miss proves a key was never
+    added; a hit only means "maybe" (at roughly ``error_rate``).
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RevocationStore:
+    """Answers "is this refresh token revoked?" without touching the database
+    in the common case.
+
+    Every revoked JTI is added to an in-memory bloom filter, so a token that
+    was never revoked (almost every refresh) is rejected by the filter alone.
+    Filter hits are confirmed against the indexed ``RevokedToken`` table and
+    the answer is kept in an LRU.  Revocations made by other workers are
+    picked up by reading rows past the highest id seen so far, at most once
+    every ``TOKEN_REVOCATION_SYNC_SECONDS``.
+
+    The table stays authoritative for rotation: ``revoke`` relies on the
+    unique JTI, so two workers racing to rotate the same token cannot both win.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all in-memory state; it is rebuilt from the table on next use."""
+        with self._lock:
+            self._bloom = None
+            self._high_water = 0
+            self._next_sync = 0.0
+            self._confirmed = LRUCache(getattr(settings, 'TOKEN_REVOCATION_LRU_SIZE', 10000))
+
+    def _rebuild(self):
+        # load every live row up to the current highest id; anything newer
+        # is picked up by the incremental sync
+        high_water = RevokedToken.objects.aggregate(high_water=Max('id'))['high_water'] or 0
+        live = RevokedToken.objects.filter(id__lte=high_water, expires_at__gt=timezone.now())
+        capacity = max(getattr(settings, 'TOKEN_REVOCATION_BLOOM_CAPACITY', 100000), 2 * live.count())
+        bloom = BloomFilter(capacity)
+        for jti in live.values_list('jti', flat=True).iterator():
+            bloom.add(jti)
+        self._bloom = bloom
+        self._high_water = high_water
+        self._confirmed.clear()
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._bloom is not None and now < self._next_sync:
+            return
+        with self._lock:
+            if self._bloom is None or self._bloom.count > self._bloom.capacity:
+                self._rebuild()
+            else:
+                new = RevokedToken.objects.filter(id__gt=self._high_water).order_by('id').values_list('id', 'jti')
+                for pk, jti in new:
+                    self._bloom.add(jti)
+                    # an earlier "not revoked" answer for this JTI is now stale
+                    self._confirmed.pop(jti)
+                    self._high_water = pk
+            self._next_sync = now + getattr(settings, 'TOKEN_REVOCATION_SYNC_SECONDS', 5)
+
+    def is_revoked(self, jti):
+        self._sync()
+        if jti not in self._bloom:
+            return False
+        revoked = self._confirmed.get(jti)
+        if revoked is None:
+            revoked = RevokedToken.objects.filter(jti=jti).exists()
+            self._confirmed.set(jti, revoked)
+        return revoked
+
+    def revoke(self, jti, expires_at):
+        """Record ``jti`` as revoked.  Returns ``False`` if it already was."""
+        self._sync()
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        with self._lock:
+            self._bloom.add(jti)
+            self._confirmed.set(jti, True)
+        return True
+
+    def purge_expired(self):
+        """Delete rows for tokens that have expired anyway.  Returns the count."""
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+revocation_store = RevocationStore()
+
+
+class RevocableRefreshToken(RefreshToken):
+    """Refresh token checked against ``revocation_store`` when decoded.
+
+    ``blacklist`` is what simplejwt's refresh serializer calls on the old
+    token when ``ROTATE_REFRESH_TOKENS`` and ``BLACKLIST_AFTER_ROTATION`` are
+    both on, so rotation revokes through the store as well.
+    """
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if revocation_store.is_revoked(self[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        revoked = revocation_store.revoke(
+            self[api_settings.JTI_CLAIM], datetime_from_epoch(self['exp'])
+        )
+        if not revoked:
+            # someone else used this token first
+            raise TokenError(_('Token is blacklisted'))
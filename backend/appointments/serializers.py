@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import Doctor, Appointment
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .models import Doctor, Appointment, WaitlistEntry
+from .last_login import last_login_buffer
+from .revocation import RevocableRefreshToken
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -34,6 +37,10 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         data = super().validate(attrs)
+        # last_login is written in batches instead of one UPDATE per login,
+        # unless simplejwt has been told to write it itself
+        if not jwt_settings.UPDATE_LAST_LOGIN:
+            last_login_buffer.record(self.user.pk)
         # add additional response fields
         data['username'] = self.user.username
         # include a flag so the frontend can detect an admin/staff user
@@ -42,6 +49,23 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh serializer that rejects revoked tokens and revokes the old
+    token on rotation (see ``appointments.revocation``).
+    """
+    token_class = RevocableRefreshToken
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    """Revoke a refresh token, e.g. on logout."""
+    refresh = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        # decoding raises TokenError for invalid or already revoked tokens
+        RevocableRefreshToken(attrs['refresh']).blacklist()
+        return {}
+
+
 class DoctorSerializer(serializers.ModelSerializer):
     """Serializer for Doctor model."""
     available_days = serializers.ListField(
@@ -59,10 +83,9 @@ class DoctorSerializer(serializers.ModelSerializer):
 
 
 class AppointmentSerializer(serializers.ModelSerializer):
-    """Serializer for Appointment model."""
-    doctor_name = serializers.CharField(source='doctor.name', read_only=True)
-    doctor_specialization = serializers.CharField(source='doctor.specialization', read_only=True)
-    user_name = serializers.CharField(source='user.username', read_only=True)
+    """Serializer for Appointment model.  The doctor and user names come from
+    the snapshot columns on the appointment itself, so listing needs no joins.
+    """
     
     class Meta:
         model = Appointment
@@ -72,7 +95,10 @@ class AppointmentSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         # regular users should never be able to change status directly
-        read_only_fields = ['id', 'status', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'status', 'created_at', 'updated_at',
+            'doctor_name', 'doctor_specialization', 'user_name'
+        ]
 
 
 class AppointmentAdminSerializer(AppointmentSerializer):
@@ -116,3 +142,28 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
             if available_days is not None and len(available_days) > 0 and weekday not in available_days:
                 raise serializers.ValidationError("Doctor is not available on the selected day")
         return data
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    """Serializer for a user's waitlist entries.  Priority is set by staff
+    (e.g. through the Django admin), so clients cannot bump themselves.
+    """
+    doctor_name = serializers.CharField(source='doctor.name', read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'doctor', 'doctor_name', 'window_start', 'window_end',
+            'priority', 'status', 'appointment', 'created_at'
+        ]
+        read_only_fields = ['id', 'priority', 'status', 'appointment', 'created_at']
+
+    def validate(self, data):
+        window_start = data.get('window_start')
+        window_end = data.get('window_end')
+        from django.utils import timezone
+        if window_start and window_end and window_end <= window_start:
+            raise serializers.ValidationError("Waitlist window must end after it starts")
+        if window_end and window_end < timezone.now():
+            raise serializers.ValidationError("Waitlist window cannot be in the past")
+        return data
@@ -0,0 +1,78 @@
+"""
+Keeps the denormalized name columns on ``Appointment`` in sync.
+
+``doctor_name``/``doctor_specialization`` and ``user_name`` are copied onto
+each appointment when it is saved.  When a doctor or user is renamed, the
+receivers below rewrite the affected appointments in primary-key batches of
+``SYNC_BATCH_SIZE`` so a rename never holds locks on all of a busy doctor's
+rows at once.  ``updated_at`` is bumped as well, which invalidates cached
+calendar events for those appointments.
+"""
+from django.contrib.auth.models import User
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Appointment, Doctor
+
+SYNC_BATCH_SIZE = 1000
+
+
+def batched_update(queryset, **values):
+    """UPDATE the rows matched by ``queryset`` in batches.  Returns the row count.
+
+    ``values`` must take rows out of ``queryset``, otherwise this never ends.
+    """
+    values['updated_at'] = timezone.now()
+    queryset = queryset.order_by()
+    total = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:SYNC_BATCH_SIZE])
+        if not ids:
+            return total
+        total += Appointment.objects.filter(id__in=ids).update(**values)
+
+
+def _touches(update_fields, *names):
+    # saves limited to other columns (e.g. last_login) can't be renames
+    return update_fields is None or bool(set(update_fields) & set(names))
+
+
+@receiver(post_save, sender=Doctor, dispatch_uid='appointment_doctor_snapshot')
+def sync_doctor_snapshot(sender, instance, created, update_fields=None, **kwargs):
+    if created or not _touches(update_fields, 'name', 'specialization'):
+        return
+    stale = Appointment.objects.filter(doctor=instance).exclude(
+        doctor_name=instance.name, doctor_specialization=instance.specialization
+    )
+    batched_update(stale, doctor_name=instance.name, doctor_specialization=instance.specialization)
+
+
+@receiver(post_save, sender=User, dispatch_uid='appointment_user_snapshot')
+def sync_user_snapshot(sender, instance, created, update_fields=None, **kwargs):
+    if created or not _touches(update_fields, 'username'):
+        return
+    stale = Appointment.objects.filter(user=instance).exclude(user_name=instance.username)
+    batched_update(stale, user_name=instance.username)
+
+
+def drifted():
+    """Appointments whose snapshot no longer matches the doctor or user."""
+    return Appointment.objects.filter(
+        ~Q(doctor_name=F('doctor__name'))
+        | ~Q(doctor_specialization=F('doctor__specialization'))
+        | ~Q(user_name=F('user__username'))
+    )
+
+
+def resync_drifted():
+    """Rewrite drifted snapshots from the related rows.  Returns the row count."""
+    return batched_update(
+        drifted(),
+        doctor_name=Subquery(Doctor.objects.filter(pk=OuterRef('doctor_id')).values('name')[:1]),
+        doctor_specialization=Subquery(
+            Doctor.objects.filter(pk=OuterRef('doctor_id')).values('specialization')[:1]
+        ),
+        user_name=Subquery(User.objects.filter(pk=OuterRef('user_id')).values('username')[:1]),
+    )
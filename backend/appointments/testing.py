@@ -0,0 +1,123 @@
+"""
+Query-count and latency budgets for requests made in tests.
+
+Test classes that mix in ``QueryBudgetMixin`` get a ``self.client`` that
+records how many SQL queries and how much wall time every request takes and
+fails the test when a request runs more queries than the budget checked in at
+``appointments/query_budgets.json``.  Budgets are kept per database vendor
+(``connection.vendor``), since some checks only query on PostgreSQL, and are
+keyed by HTTP method and URL name, e.g. ``"GET doctor-list"``.
+
+Wall time depends on the machine, so it is only enforced with
+``CHECK_QUERY_BUDGET_MS=1``, e.g. when profiling on a known box.
+
+To (re)write the budgets for the current database from the current code, run
+the tests with ``UPDATE_QUERY_BUDGETS=1``::
+
+    UPDATE_QUERY_BUDGETS=1 python manage.py test appointments.tests
+
+Only the budgets for requests made in that run are replaced.  Streaming
+responses are measured up to the point the view returns.
+"""
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, resolve
+
+BUDGET_FILE = Path(__file__).resolve().with_name('query_budgets.json')
+UPDATE_ENV = 'UPDATE_QUERY_BUDGETS'
+CHECK_MS_ENV = 'CHECK_QUERY_BUDGET_MS'
+
+
+class QueryBudget:
+    def __init__(self, path=BUDGET_FILE):
+        self.path = Path(path)
+        self.updating = os.environ.get(UPDATE_ENV) == '1'
+        self.check_ms = os.environ.get(CHECK_MS_ENV) == '1'
+        self.budgets = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self.observed = {}
+
+    def check(self, key, queries, ms):
+        vendor = connection.vendor
+        if self.updating:
+            worst = self.observed.setdefault(vendor, {}).setdefault(key, {'queries': 0, 'ms': 0.0})
+            worst['queries'] = max(worst['queries'], queries)
+            worst['ms'] = max(worst['ms'], ms)
+            return
+        budget = self.budgets.get(vendor, {}).get(key)
+        if budget is None:
+            raise AssertionError(
+                f'No query budget for "{key}" on {vendor}; run the tests with {UPDATE_ENV}=1 to add it'
+            )
+        if queries > budget['queries']:
+            raise AssertionError(
+                f'"{key}" ran {queries} queries on {vendor}, budget is {budget["queries"]}'
+            )
+        if self.check_ms and ms > budget['ms']:
+            raise AssertionError(f'"{key}" took {ms:.0f} ms, budget is {budget["ms"]} ms')
+
+    def save(self):
+        if not self.updating or not self.observed:
+            return
+        for vendor, observed in self.observed.items():
+            budgets = self.budgets.setdefault(vendor, {})
+            for key, worst in observed.items():
+                # query counts are exact; leave headroom on time for slower machines
+                budgets[key] = {'queries': worst['queries'], 'ms': math.ceil(worst['ms'] * 3 + 100)}
+            self.budgets[vendor] = dict(sorted(budgets.items()))
+        self.path.write_text(json.dumps(dict(sorted(self.budgets.items())), indent=2) + '\n')
+
+
+query_budget = QueryBudget()
+
+
+class BudgetedClient(Client):
+    """Test client that checks every request against ``query_budget``."""
+
+    def request(self, **request):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = super().request(**request)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        try:
+            url_name = resolve(request['PATH_INFO']).url_name or request['PATH_INFO']
+        except Resolver404:
+            url_name = request['PATH_INFO']
+        query_budget.check(f"{request['REQUEST_METHOD']} {url_name}", len(queries), elapsed_ms)
+        return response
+
+
+class QueryBudgetMixin:
+    """Mix into a ``TestCase`` to run its ``self.client`` requests against the budget file."""
+    client_class = BudgetedClient
+
+    @classmethod
+    def tearDownClass(cls):
+        query_budget.save()
+        super().tearDownClass()
+
+
+class TestRunner(DiscoverRunner):
+    """Writes ``last_login`` on every login while tests run.
+
+    The buffer is process-wide, so buffered logins would outlive the test
+    that made them and be written in another test's transaction or after the
+    test database is gone.  Tests of the buffer itself turn it back on with
+    ``override_settings(LAST_LOGIN_BUFFERED=True)`` and clear it afterwards.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._unbuffered = override_settings(LAST_LOGIN_BUFFERED=False)
+        self._unbuffered.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._unbuffered.disable()
+        super().teardown_test_environment(**kwargs)
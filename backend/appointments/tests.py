@@ -1,10 +1,14 @@
-from django.test import TestCase, Client
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 
+from appointments.testing import QueryBudgetMixin
+
 
-class TestRegistration(TestCase):
+class TestRegistration(QueryBudgetMixin, TestCase):
     def setUp(self):
-        self.client = Client()
         self.url = reverse('user-register')
 
     def test_successful_registration(self):
@@ -31,9 +35,8 @@ class TestRegistration(TestCase):
         self.assertIn('Passwords do not match', resp.content.decode())
 
 
-class TestToken(TestCase):
+class TestToken(QueryBudgetMixin, TestCase):
     def setUp(self):
-        self.client = Client()
         self.register_url = reverse('user-register')
         self.token_url = reverse('token_obtain_pair')
         # create a user so token endpoint can be tested
@@ -74,10 +77,9 @@ class TestToken(TestCase):
         self.assertTrue(data.get('is_superuser'))
 
 
-class TestAdminEndpoints(TestCase):
+class TestAdminEndpoints(QueryBudgetMixin, TestCase):
     def setUp(self):
         from django.contrib.auth.models import User
-        self.client = Client()
         # normal user
         self.user = User.objects.create_user('normal', 'n@o.com', 'pass1234')
         # staff user
@@ -217,3 +219,1082 @@ class TestAdminEndpoints(TestCase):
         self.assertEqual(patch.status_code, 200)
         self.assertEqual(patch.json()['status'], 'Approved')
 
+
+class TestWaitlist(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from datetime import timedelta
+        from appointments.models import Doctor
+        self.staff = User.objects.create_user('wlstaff', 'ws@t.com', 'pass1234', is_staff=True)
+        self.doctor = Doctor.objects.create(
+            name='Dr Queue', specialization='Test', email='queue@h.com', phone='333',
+            available_from='00:00', available_to='23:59', available_days='0,1,2,3,4,5,6'
+        )
+        base = (timezone.now() + timedelta(days=2)).replace(minute=0, second=0, microsecond=0)
+        self.slots = [base + timedelta(hours=i) for i in range(3)]
+        self.window = (base - timedelta(hours=1), base + timedelta(hours=5))
+
+    def authenticate(self, user):
+        resp = self.client.post(reverse('token_obtain_pair'), {
+            'username': user.username,
+            'password': 'pass1234'
+        }, content_type='application/json')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {resp.json().get('access')}"
+
+    def book(self, user, slot):
+        from appointments.models import Appointment
+        return Appointment.objects.create(user=user, doctor=self.doctor, appointment_date=slot)
+
+    def test_user_can_join_waitlist(self):
+        from django.contrib.auth.models import User
+        user = User.objects.create_user('waiter', 'w@w.com', 'pass1234')
+        self.authenticate(user)
+        resp = self.client.post(reverse('waitlist-list-create'), {
+            'doctor': self.doctor.id,
+            'window_start': self.window[0].isoformat(),
+            'window_end': self.window[1].isoformat(),
+            'priority': 9,
+        }, content_type='application/json')
+        self.assertEqual(resp.status_code, 201, resp.content.decode())
+        self.assertEqual(resp.json()['status'], 'Waiting')
+        # priority is staff-controlled
+        self.assertEqual(resp.json()['priority'], 0)
+        listing = self.client.get(reverse('waitlist-list-create'))
+        self.assertEqual(len(listing.json()), 1)
+
+    def test_cancellation_promotes_waiter(self):
+        from django.contrib.auth.models import User
+        from appointments.models import Appointment, WaitlistEntry
+        owner = User.objects.create_user('owner', 'o@o.com', 'pass1234')
+        waiter = User.objects.create_user('waiter', 'w@w.com', 'pass1234')
+        appt = self.book(owner, self.slots[0])
+        entry = WaitlistEntry.objects.create(
+            user=waiter, doctor=self.doctor, window_start=self.window[0], window_end=self.window[1]
+        )
+        self.authenticate(owner)
+        resp = self.client.delete(reverse('appointment-detail', args=[appt.id]))
+        self.assertEqual(resp.status_code, 204)
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, WaitlistEntry.PROMOTED)
+        self.assertEqual(entry.appointment.user, waiter)
+        self.assertEqual(entry.appointment.appointment_date, self.slots[0])
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 1)
+
+    def test_rejection_promotes_waiter_outside_window_ignored(self):
+        from django.contrib.auth.models import User
+        from datetime import timedelta
+        from appointments.models import WaitlistEntry
+        owner = User.objects.create_user('owner', 'o@o.com', 'pass1234')
+        appt = self.book(owner, self.slots[0])
+        # a higher priority waiter whose window does not cover the slot
+        late = WaitlistEntry.objects.create(
+            user=User.objects.create_user('late', 'l@l.com', 'pass1234'), doctor=self.doctor,
+            window_start=self.slots[0] + timedelta(minutes=1), window_end=self.window[1], priority=5
+        )
+        fits = WaitlistEntry.objects.create(
+            user=User.objects.create_user('fits', 'f@f.com', 'pass1234'), doctor=self.doctor,
+            window_start=self.window[0], window_end=self.window[1]
+        )
+        self.authenticate(self.staff)
+        resp = self.client.patch(reverse('admin-appointment-detail', args=[appt.id]),
+                                 {'status': 'Rejected'}, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        late.refresh_from_db()
+        fits.refresh_from_db()
+        self.assertEqual(late.status, WaitlistEntry.WAITING)
+        self.assertEqual(fits.status, WaitlistEntry.PROMOTED)
+
+    def test_unrejecting_a_reassigned_slot_is_refused(self):
+        from django.contrib.auth.models import User
+        from appointments.models import Appointment, WaitlistEntry
+        owner = User.objects.create_user('owner', 'o@o.com', 'pass1234')
+        appt = self.book(owner, self.slots[0])
+        WaitlistEntry.objects.create(
+            user=User.objects.create_user('waiter', 'w@w.com', 'pass1234'), doctor=self.doctor,
+            window_start=self.window[0], window_end=self.window[1]
+        )
+        self.authenticate(self.staff)
+        url = reverse('admin-appointment-detail', args=[appt.id])
+        self.assertEqual(self.client.patch(url, {'status': 'Rejected'}, content_type='application/json').status_code, 200)
+        # the waiter has the slot now; putting the original back would double-book it
+        resp = self.client.patch(url, {'status': 'Approved'}, content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        appt.refresh_from_db()
+        self.assertEqual(appt.status, 'Rejected')
+        self.assertEqual(Appointment.objects.filter(appointment_date=self.slots[0]).exclude(status='Rejected').count(), 1)
+        # a slot nobody took can be restored
+        other = self.book(owner, self.slots[1])
+        other_url = reverse('admin-appointment-detail', args=[other.id])
+        Appointment.objects.filter(pk=other.pk).update(status='Rejected')
+        self.assertEqual(self.client.patch(other_url, {'status': 'Pending'}, content_type='application/json').status_code, 200)
+
+    def test_booking_a_taken_slot_is_refused(self):
+        from django.contrib.auth.models import User
+        self.book(User.objects.create(username='first'), self.slots[0])
+        self.authenticate(self.staff)
+        resp = self.client.post(reverse('appointment-list-create'), {
+            'doctor': self.doctor.id, 'appointment_date': self.slots[0].isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('appointment_date', resp.json())
+
+    def test_promotion_expires_entries_whose_window_has_passed(self):
+        from datetime import timedelta
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from appointments.models import WaitlistEntry
+        from appointments.waitlist import promote_from_waitlist
+        now = timezone.now()
+        stale = WaitlistEntry.objects.create(
+            user=User.objects.create(username='stale'), doctor=self.doctor, priority=9,
+            window_start=now - timedelta(days=2), window_end=now - timedelta(days=1),
+        )
+        current = WaitlistEntry.objects.create(
+            user=User.objects.create(username='current'), doctor=self.doctor,
+            window_start=self.window[0], window_end=self.window[1],
+        )
+        self.assertIsNotNone(promote_from_waitlist(self.doctor, self.slots[0]))
+        stale.refresh_from_db()
+        current.refresh_from_db()
+        self.assertEqual(stale.status, WaitlistEntry.EXPIRED)
+        self.assertEqual(current.status, WaitlistEntry.PROMOTED)
+
+    def test_repeated_releases_follow_queue_order(self):
+        from django.contrib.auth.models import User
+        from appointments.models import Appointment, WaitlistEntry
+        from appointments.waitlist import promote_from_waitlist
+        # plain users: nobody logs in here, so skip password hashing
+        owners = [User.objects.create(username=f'owner{i}') for i in range(3)]
+        booked = [self.book(owner, slot) for owner, slot in zip(owners, self.slots)]
+        entries = []
+        for i in range(60):
+            user = User.objects.create(username=f'waiter{i}')
+            entries.append(WaitlistEntry.objects.create(
+                user=user, doctor=self.doctor, priority=i % 4,
+                window_start=self.window[0], window_end=self.window[1],
+            ))
+        expected = sorted(entries, key=lambda e: (-e.priority, e.created_at, e.id))
+
+        # every slot is cancelled over and over; each cancellation hands the slot
+        # to the next waiter in queue order, exactly once
+        promoted = []
+        for _ in range(10):
+            for i, appt in enumerate(booked):
+                slot = appt.appointment_date
+                appt.delete()
+                # a second release of the same slot must not double-book it
+                booked[i] = promote_from_waitlist(self.doctor, slot)
+                self.assertIsNone(promote_from_waitlist(self.doctor, slot))
+                promoted.append(booked[i].user_id)
+
+        self.assertEqual(promoted, [e.user_id for e in expected[:30]])
+        self.assertEqual(len(set(promoted)), 30)
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 3)
+        self.assertEqual(WaitlistEntry.objects.filter(status=WaitlistEntry.WAITING).count(), 30)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs row locks (SELECT ... FOR UPDATE SKIP LOCKED)')
+class TestWaitlistConcurrency(TransactionTestCase):
+    """Slots released from several threads at once, each in its own transaction."""
+    THREADS = 8
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from appointments.models import Doctor
+        self.doctor = Doctor.objects.create(
+            name='Dr Busy', specialization='Test', email='busy@h.com', phone='777',
+            available_from='00:00', available_to='23:59', available_days='0,1,2,3,4,5,6'
+        )
+        self.base = (timezone.now() + timedelta(days=2)).replace(minute=0, second=0, microsecond=0)
+        self.owners = [User.objects.create(username=f'holder{i}') for i in range(self.THREADS)]
+
+    def join_waitlist(self, count, window_hours):
+        from datetime import timedelta
+        from django.contrib.auth.models import User
+        from appointments.models import WaitlistEntry
+        for i in range(count):
+            WaitlistEntry.objects.create(
+                user=User.objects.create(username=f'queued{i}'), doctor=self.doctor, priority=i % 3,
+                window_start=self.base - timedelta(hours=1), window_end=self.base + timedelta(hours=window_hours),
+            )
+
+    def release_concurrently(self, appointments):
+        """Cancel every appointment from its own thread, all at the same moment."""
+        import threading
+        from django.db import connection, transaction
+        from appointments.waitlist import promote_from_waitlist
+        barrier = threading.Barrier(len(appointments))
+        errors = []
+
+        def release(appointment):
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    appointment.delete()
+                    promote_from_waitlist(self.doctor, appointment.appointment_date)
+            except Exception as exc:  # surfaced below, threads can't fail the test
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=release, args=[a]) for a in appointments]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_one_slot_released_many_times_is_booked_once(self):
+        from appointments.models import Appointment, WaitlistEntry
+        # the same slot held several times over (e.g. re-booked after rejections)
+        held = [
+            Appointment.objects.create(user=owner, doctor=self.doctor, appointment_date=self.base)
+            for owner in self.owners
+        ]
+        self.join_waitlist(self.THREADS, window_hours=1)
+        self.release_concurrently(held)
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor, appointment_date=self.base).count(), 1)
+        self.assertEqual(WaitlistEntry.objects.filter(status=WaitlistEntry.PROMOTED).count(), 1)
+
+    def test_concurrent_releases_give_each_waiter_at_most_one_slot(self):
+        from datetime import timedelta
+        from appointments.models import Appointment, WaitlistEntry
+        held = [
+            Appointment.objects.create(user=owner, doctor=self.doctor, appointment_date=self.base + timedelta(hours=i))
+            for i, owner in enumerate(self.owners)
+        ]
+        self.join_waitlist(self.THREADS * 3, window_hours=self.THREADS)
+        self.release_concurrently(held)
+        promoted = Appointment.objects.filter(doctor=self.doctor).exclude(user__in=self.owners)
+        self.assertEqual(promoted.count(), self.THREADS)
+        self.assertEqual(len(set(promoted.values_list('user_id', flat=True))), self.THREADS)
+        self.assertEqual(len(set(promoted.values_list('appointment_date', flat=True))), self.THREADS)
+        self.assertEqual(WaitlistEntry.objects.filter(status=WaitlistEntry.PROMOTED).count(), self.THREADS)
+
+
+class TestApiOnlyProfile(QueryBudgetMixin, TestCase):
+    def test_api_profile_drops_browser_only_apps(self):
+        from backend import settings_api
+        for app in settings_api.BROWSER_ONLY_APPS:
+            self.assertNotIn(app, settings_api.INSTALLED_APPS)
+        for middleware in settings_api.BROWSER_ONLY_MIDDLEWARE:
+            self.assertNotIn(middleware, settings_api.MIDDLEWARE)
+        self.assertIn('appointments', settings_api.INSTALLED_APPS)
+        self.assertEqual(settings_api.TEMPLATES, [])
+
+    def test_api_urlconf_serves_api_without_admin(self):
+        from django.test import override_settings
+        with override_settings(ROOT_URLCONF='backend.urls_api'):
+            self.assertEqual(self.client.get('/api/health/').status_code, 200)
+            self.assertEqual(self.client.get('/api/doctors/').status_code, 200)
+            self.assertEqual(self.client.get('/admin/').status_code, 404)
+
+
+class TestTokenRevocation(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from appointments.revocation import revocation_store
+        revocation_store.reset()
+        User.objects.create_user('rotator', 'r@r.com', 'pass1234')
+        resp = self.client.post(reverse('token_obtain_pair'), {
+            'username': 'rotator', 'password': 'pass1234'
+        }, content_type='application/json')
+        self.refresh = resp.json()['refresh']
+
+    def refresh_with(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': token},
+                                content_type='application/json')
+
+    def test_refresh_rotates_and_old_token_is_rejected(self):
+        resp = self.refresh_with(self.refresh)
+        self.assertEqual(resp.status_code, 200)
+        rotated = resp.json()['refresh']
+        self.assertNotEqual(rotated, self.refresh)
+        # reusing the old refresh token fails, the rotated one works
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 401)
+        self.assertEqual(self.refresh_with(rotated).status_code, 200)
+
+    def test_revoke_endpoint_logs_out(self):
+        resp = self.client.post(reverse('token_revoke'), {'refresh': self.refresh},
+                                content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 401)
+
+    def test_unrevoked_check_does_not_hit_database(self):
+        from appointments.revocation import revocation_store
+        revocation_store.is_revoked('warm-up')
+        with self.assertNumQueries(0):
+            for i in range(100):
+                self.assertFalse(revocation_store.is_revoked(f'never-revoked-{i}'))
+
+    def test_revocation_by_another_worker_is_synced(self):
+        from datetime import timedelta
+        from django.test import override_settings
+        from django.utils import timezone
+        from appointments.models import RevokedToken
+        from appointments.revocation import revocation_store
+        with override_settings(TOKEN_REVOCATION_SYNC_SECONDS=0):
+            self.assertFalse(revocation_store.is_revoked('elsewhere'))
+            RevokedToken.objects.create(jti='elsewhere', expires_at=timezone.now() + timedelta(days=1))
+            self.assertTrue(revocation_store.is_revoked('elsewhere'))
+
+    def test_purge_removes_only_expired_rows(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from appointments.models import RevokedToken
+        RevokedToken.objects.create(jti='old', expires_at=timezone.now() - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', expires_at=timezone.now() + timedelta(days=1))
+        call_command('purge_revoked_tokens', stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+@override_settings(LAST_LOGIN_BUFFERED=True, LAST_LOGIN_FLUSH_SECONDS=3600)
+class TestLastLoginBuffer(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from appointments.last_login import last_login_buffer
+        self.buffer = last_login_buffer
+        # the buffer is process-wide; nothing may leak into other tests
+        self.buffer.clear()
+        self.addCleanup(self.buffer.clear)
+        self.users = [User.objects.create_user(f'login{i}', f'l{i}@l.com', 'pass1234') for i in range(5)]
+
+    def login_all(self):
+        for user in self.users:
+            resp = self.client.post(reverse('token_obtain_pair'), {
+                'username': user.username, 'password': 'pass1234'
+            }, content_type='application/json')
+            self.assertEqual(resp.status_code, 200)
+
+    def user_updates(self, queries):
+        return [q for q in queries if q['sql'].startswith('UPDATE "auth_user"')]
+
+    def test_logins_are_coalesced_and_flushed_on_shutdown(self):
+        from django.db import connection
+        from django.test import override_settings
+        from django.test.utils import CaptureQueriesContext
+        from appointments.models import User
+        with override_settings(LAST_LOGIN_FLUSH_SIZE=1000, LAST_LOGIN_FLUSH_SECONDS=3600):
+            with CaptureQueriesContext(connection) as logins:
+                self.login_all()
+        # no per-login write on the request path
+        self.assertEqual(self.user_updates(logins.captured_queries), [])
+        self.assertFalse(User.objects.filter(pk__in=[u.pk for u in self.users], last_login__isnull=False).exists())
+
+        # clean shutdown: one batched UPDATE, nothing lost
+        with CaptureQueriesContext(connection) as shutdown:
+            self.assertEqual(self.buffer.flush(), len(self.users))
+        self.assertEqual(len(self.user_updates(shutdown.captured_queries)), 1)
+        self.assertEqual(User.objects.filter(pk__in=[u.pk for u in self.users], last_login__isnull=False).count(), len(self.users))
+
+    def test_size_threshold_flushes_after_request(self):
+        from django.test import override_settings
+        from appointments.models import User
+        with override_settings(LAST_LOGIN_FLUSH_SIZE=len(self.users), LAST_LOGIN_FLUSH_SECONDS=3600):
+            self.login_all()
+        self.assertEqual(User.objects.filter(pk__in=[u.pk for u in self.users], last_login__isnull=False).count(), len(self.users))
+
+    def test_synchronous_update_last_login_is_not_buffered(self):
+        from unittest import mock
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework_simplejwt.settings import api_settings
+        # simplejwt's serializers hold this object, so override_settings can't reach them
+        with mock.patch.object(api_settings, 'UPDATE_LAST_LOGIN', True):
+            with CaptureQueriesContext(connection) as logins:
+                self.login_all()
+        self.assertEqual(len(self.user_updates(logins.captured_queries)), len(self.users))
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_older_flush_never_overwrites_newer_login(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        user = self.users[0]
+        newer = timezone.now()
+        # another worker already wrote a newer login
+        type(user).objects.filter(pk=user.pk).update(last_login=newer)
+        self.buffer.record(user.pk, newer - timedelta(minutes=5))
+        self.buffer.flush()
+        user.refresh_from_db()
+        self.assertEqual(user.last_login, newer)
+
+    def test_unbuffered_logins_are_written_immediately(self):
+        from django.test import override_settings
+        from appointments.models import User
+        with override_settings(LAST_LOGIN_BUFFERED=False):
+            self.login_all()
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(User.objects.filter(pk__in=[u.pk for u in self.users], last_login__isnull=False).count(), len(self.users))
+
+    def test_latest_timestamp_wins(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        user = self.users[0]
+        later = timezone.now()
+        self.buffer.record(user.pk, later)
+        self.buffer.record(user.pk, later - timedelta(minutes=5))
+        self.buffer.flush()
+        user.refresh_from_db()
+        self.assertEqual(user.last_login, later)
+
+
+class TestCalendarFeeds(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import caches
+        from django.utils import timezone
+        from datetime import timedelta
+        from appointments.ics import ICS_CACHE
+        from appointments.models import Appointment, Doctor
+        caches[ICS_CACHE].clear()
+        self.staff = User.objects.create_user('calstaff', 'cs@t.com', 'pass1234', is_staff=True)
+        self.patient = User.objects.create_user('calpatient', 'cp@t.com', 'pass1234')
+        other = User.objects.create(username='other')
+        self.doctor = Doctor.objects.create(
+            name='Cal, Dr', specialization='Cardiology', email='cal@h.com', phone='444'
+        )
+        when = (timezone.now() + timedelta(days=3)).replace(microsecond=0)
+        self.mine = Appointment.objects.create(user=self.patient, doctor=self.doctor, appointment_date=when)
+        Appointment.objects.create(user=other, doctor=self.doctor, appointment_date=when + timedelta(hours=1))
+        Appointment.objects.create(user=other, doctor=self.doctor, appointment_date=when, status='Rejected')
+
+    def authenticate(self, user):
+        resp = self.client.post(reverse('token_obtain_pair'), {
+            'username': user.username, 'password': 'pass1234'
+        }, content_type='application/json')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {resp.json().get('access')}"
+
+    def body(self, resp):
+        return b''.join(resp.streaming_content).decode()
+
+    def feed_url(self, link_url, user, issue=True):
+        """POST issues a new subscription URL; GET returns the current one."""
+        self.authenticate(user)
+        resp = (self.client.post if issue else self.client.get)(link_url)
+        self.assertEqual(resp.status_code, 200)
+        # calendar clients send no credentials
+        self.client.defaults.pop('HTTP_AUTHORIZATION')
+        url = resp.json()['url']
+        self.assertTrue(resp.json()['webcal_url'].startswith('webcal://'))
+        return url[url.index('/api/'):]
+
+    def test_doctor_feed_lists_active_appointments(self):
+        url = self.feed_url(reverse('doctor-calendar', args=[self.doctor.id]), self.staff)
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['Content-Type'].startswith('text/calendar'))
+        body = self.body(resp)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'UID:appointment-{self.mine.id}@online-medical', body)
+        # text values are escaped
+        self.assertIn('Dr. Cal\\, Dr', body)
+
+    def test_doctor_link_is_staff_only(self):
+        self.authenticate(self.patient)
+        resp = self.client.get(reverse('doctor-calendar', args=[self.doctor.id]))
+        self.assertEqual(resp.status_code, 403)
+
+    def test_reading_the_link_never_creates_a_key(self):
+        from appointments.models import CalendarFeedKey
+        self.authenticate(self.patient)
+        self.assertEqual(self.client.get(reverse('user-calendar')).status_code, 404)
+        self.authenticate(self.staff)
+        self.assertEqual(self.client.get(reverse('doctor-calendar', args=[self.doctor.id])).status_code, 404)
+        self.assertFalse(CalendarFeedKey.objects.exists())
+
+    def test_user_feed_only_has_own_appointments(self):
+        body = self.body(self.client.get(self.feed_url(reverse('user-calendar'), self.patient)))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'UID:appointment-{self.mine.id}@', body)
+
+    def test_forged_and_rotated_tokens_are_rejected(self):
+        url = self.feed_url(reverse('user-calendar'), self.patient)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        token = url.split('/')[-1][:-len('.ics')]
+        # a tampered token fails the signature check
+        forged = reverse('calendar-feed', args=[token.replace(token[5], 'A' if token[5] != 'A' else 'B', 1)])
+        self.assertEqual(self.client.get(forged).status_code, 404)
+        self.assertEqual(self.feed_url(reverse('user-calendar'), self.patient, issue=False), url)
+        rotated = self.feed_url(reverse('user-calendar'), self.patient)
+        self.assertNotEqual(rotated, url)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(rotated).status_code, 200)
+
+    def test_if_none_match_and_cached_events(self):
+        from unittest import mock
+        from appointments import ics
+        url = self.feed_url(reverse('doctor-calendar', args=[self.doctor.id]), self.staff)
+        with mock.patch('appointments.ics.render_vevent', wraps=ics.render_vevent) as render:
+            first = self.client.get(url)
+            self.body(first)
+            self.assertEqual(render.call_count, 2)
+            etag = first['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # without the ETag the feed is re-sent, but from cached VEVENTs
+            self.body(self.client.get(url))
+            self.assertEqual(render.call_count, 2)
+
+            # a change produces a new version and re-renders only that event
+            self.mine.status = 'Approved'
+            self.mine.save()
+            changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(changed.status_code, 200)
+            self.assertNotEqual(changed['ETag'], etag)
+            self.assertIn('STATUS:CONFIRMED', self.body(changed))
+            self.assertEqual(render.call_count, 3)
+
+    def test_large_feed_is_served_from_cache(self):
+        from datetime import timedelta
+        from unittest import mock
+        from appointments import ics
+        from appointments.models import Appointment
+        # more events than LocMemCache's default MAX_ENTRIES of 300
+        Appointment.objects.bulk_create([
+            Appointment(
+                user=self.patient, doctor=self.doctor, appointment_date=self.mine.appointment_date + timedelta(minutes=30 * i),
+                doctor_name=self.doctor.name, doctor_specialization=self.doctor.specialization,
+                user_name=self.patient.username,
+            )
+            for i in range(1, 351)
+        ])
+        url = self.feed_url(reverse('user-calendar'), self.patient)
+        with mock.patch('appointments.ics.render_vevent', wraps=ics.render_vevent) as render:
+            self.assertEqual(self.body(self.client.get(url)).count('BEGIN:VEVENT'), 351)
+            self.assertEqual(render.call_count, 351)
+            self.assertEqual(self.body(self.client.get(url)).count('BEGIN:VEVENT'), 351)
+            self.assertEqual(render.call_count, 351)
+
+    def test_long_lines_are_folded(self):
+        from appointments.ics import fold
+        folded = fold('SUMMARY:' + 'é' * 100)
+        lines = folded.split('\r\n')[:-1]
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual(''.join(line[1:] if i else line for i, line in enumerate(lines)), 'SUMMARY:' + 'é' * 100)
+
+
+class TestUtilizationAnalytics(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        from datetime import datetime
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from appointments.models import Appointment, Doctor
+        self.staff = User.objects.create_user('anstaff', 'an@t.com', 'pass1234', is_staff=True)
+        patient = User.objects.create(username='anpatient')
+        self.cardio = Doctor.objects.create(
+            name='Heart', specialization='Cardiology', email='heart@h.com', phone='1',
+            available_from='09:00', available_to='17:00', available_days='0,1,2,3,4'
+        )
+        self.derma = Doctor.objects.create(
+            name='Skin', specialization='Dermatology', email='skin@h.com', phone='2',
+            available_from='09:00', available_to='12:00', available_days='0'
+        )
+
+        def book(doctor, *args, status='Pending'):
+            Appointment.objects.create(
+                user=patient, doctor=doctor, status=status,
+                appointment_date=timezone.make_aware(datetime(*args)),
+            )
+        # week of Monday 2030-01-07 and the next one
+        book(self.cardio, 2030, 1, 7, 10, 0)
+        book(self.cardio, 2030, 1, 7, 10, 30)
+        book(self.cardio, 2030, 1, 12, 10, 0)  # Saturday, outside availability
+        book(self.cardio, 2030, 1, 15, 10, 0)
+        book(self.cardio, 2030, 1, 15, 11, 0, status='Rejected')
+        book(self.derma, 2030, 1, 7, 9, 0)
+
+    def report(self):
+        from datetime import date
+        from appointments.analytics import utilization_report
+        return utilization_report(date(2030, 1, 7), date(2030, 1, 21))
+
+    def test_doctor_without_available_days_is_available_every_day(self):
+        from datetime import datetime
+        from django.utils import timezone
+        from appointments.models import Appointment, Doctor
+        anyday = Doctor.objects.create(
+            name='Anyday', specialization='General', email='any@h.com', phone='3',
+            available_from='09:00', available_to='10:00', available_days=''
+        )
+        Appointment.objects.create(
+            user=self.staff, doctor=anyday, appointment_date=timezone.make_aware(datetime(2030, 1, 12, 9, 0)),
+        )
+        doctor = next(d for d in self.report()['doctors'] if d['doctor_id'] == anyday.id)
+        self.assertEqual(doctor['available_hours'], 14.0)
+        self.assertEqual(doctor['booked_hours'], 0.5)
+        self.assertEqual(doctor['outside_availability'], 0)
+
+    def test_doctor_utilization(self):
+        report = self.report()
+        self.assertEqual(report['weeks'], ['2030-01-07', '2030-01-14'])
+        cardio = next(d for d in report['doctors'] if d['doctor_id'] == self.cardio.id)
+        self.assertEqual(cardio['available_hours'], 80.0)
+        self.assertEqual(cardio['booked_hours'], 2.0)
+        self.assertEqual(cardio['utilization'], 0.025)
+        self.assertEqual(cardio['outside_availability'], 1)
+        self.assertEqual([w['booked_hours'] for w in cardio['weekly']], [1.5, 0.5])
+        derma = next(d for d in report['doctors'] if d['doctor_id'] == self.derma.id)
+        self.assertEqual((derma['available_hours'], derma['booked_hours']), (6.0, 0.5))
+
+    def test_specializations_gaps_and_peaks(self):
+        report = self.report()
+        specs = {s['specialization']: s for s in report['specializations']}
+        self.assertEqual(specs['Cardiology']['gaps'], [])
+        # the clinic is open Mon-Fri 9-17, dermatology only covers Monday 9-12
+        self.assertEqual(len(specs['Dermatology']['gaps']), 5 * 8 - 3)
+        self.assertNotIn({'weekday': 0, 'hour': 9}, specs['Dermatology']['gaps'])
+        self.assertEqual(report['peak_hours']['busiest'][0], {'weekday': 0, 'hour': 10, 'appointments': 2})
+        self.assertEqual(sum(report['peak_hours']['by_hour']), 5)
+
+    def test_endpoint(self):
+        url = reverse('admin-utilization')
+        resp = self.client.post(reverse('token_obtain_pair'), {
+            'username': 'anstaff', 'password': 'pass1234'
+        }, content_type='application/json')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {resp.json()['access']}"
+        resp = self.client.get(url, {'start': '2030-01-07', 'end': '2030-01-21'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()['doctors']), 2)
+        self.assertEqual(self.client.get(url, {'start': '2030-01-21', 'end': '2030-01-07'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'soon'}).status_code, 400)
+
+    def test_report_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('utilization_report', '--start', '2030-01-07', '--end', '2030-01-21', stdout=out)
+        self.assertIn('Heart', out.getvalue())
+        self.assertIn('Peak hours: Mon 10:00 (2)', out.getvalue())
+
+
+class TestIdempotencyKeys(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from datetime import timedelta
+        from appointments.idempotency import idempotency_store
+        from appointments.models import Doctor
+        idempotency_store.clear_front()
+        self.user = User.objects.create_user('retrier', 'rt@r.com', 'pass1234')
+        doctor = Doctor.objects.create(
+            name='Dr Retry', specialization='Test', email='retry@h.com', phone='555',
+            available_from='00:00', available_to='23:59', available_days='0,1,2,3,4,5,6'
+        )
+        resp = self.client.post(reverse('token_obtain_pair'), {
+            'username': 'retrier', 'password': 'pass1234'
+        }, content_type='application/json')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {resp.json()['access']}"
+        self.payload = {
+            'doctor': doctor.id,
+            'appointment_date': (timezone.now() + timedelta(days=1)).isoformat(),
+        }
+
+    def book(self, key, payload=None):
+        return self.client.post(reverse('appointment-list-create'), payload or self.payload,
+                                content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def inserts(self, queries):
+        return [q for q in queries if q['sql'].startswith('INSERT')]
+
+    def test_retry_replays_response_without_inserts(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from appointments.idempotency import idempotency_store
+        from appointments.models import Appointment
+        first = self.book('retry-1')
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as retry:
+            second = self.book('retry-1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.inserts(retry.captured_queries), [])
+        # another worker (empty in-memory front) replays from the table
+        idempotency_store.clear_front()
+        with CaptureQueriesContext(connection) as retry:
+            third = self.book('retry-1')
+        self.assertEqual(third.json(), first.json())
+        self.assertEqual(self.inserts(retry.captured_queries), [])
+        self.assertEqual(Appointment.objects.filter(user=self.user).count(), 1)
+        # a new key is a new booking
+        from datetime import timedelta
+        from django.utils import timezone
+        later = {**self.payload, 'appointment_date': (timezone.now() + timedelta(days=2)).isoformat()}
+        self.assertEqual(self.book('retry-2', later).status_code, 201)
+        self.assertEqual(Appointment.objects.filter(user=self.user).count(), 2)
+
+    def test_key_reused_with_different_payload(self):
+        self.assertEqual(self.book('reused').status_code, 201)
+        other = {**self.payload, 'appointment_date': '2099-01-01T10:00:00Z'}
+        self.assertEqual(self.book('reused', other).status_code, 422)
+
+    def test_concurrent_duplicate_gets_conflict(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from appointments.models import Appointment, IdempotencyKey
+        # the first request with this key is still running in another worker
+        IdempotencyKey.objects.create(
+            scope=f'user:{self.user.pk}:{reverse("appointment-list-create")}', key='in-flight',
+            fingerprint='', expires_at=timezone.now() + timedelta(hours=1),
+        )
+        self.assertEqual(self.book('in-flight').status_code, 409)
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_abandoned_claim_is_taken_over_after_lease(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from appointments.idempotency import request_fingerprint
+        from appointments.models import Appointment, IdempotencyKey
+        # the first request claimed the key, then its worker died
+        claim = IdempotencyKey.objects.create(
+            scope=f'user:{self.user.pk}:{reverse("appointment-list-create")}', key='orphan',
+            fingerprint=request_fingerprint(self.payload),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        self.assertEqual(self.book('orphan').status_code, 409)
+        IdempotencyKey.objects.filter(pk=claim.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        # a different payload still can't reuse the key
+        other = {**self.payload, 'appointment_date': (timezone.now() + timedelta(days=2)).isoformat()}
+        self.assertEqual(self.book('orphan', other).status_code, 409)
+        resp = self.book('orphan')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertEqual(self.book('orphan')['Idempotent-Replayed'], 'true')
+
+    def test_failed_response_store_keeps_no_booking(self):
+        from unittest import mock
+        from django.db import DatabaseError
+        from appointments.idempotency import idempotency_store
+        from appointments.models import Appointment, IdempotencyKey
+        # the booking is inserted, then storing its response fails
+        with mock.patch.object(idempotency_store, '_store', side_effect=DatabaseError('lost connection')):
+            with self.assertRaises(DatabaseError):
+                self.book('store-fails')
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.book('store-fails').status_code, 201)
+        self.assertEqual(self.book('store-fails')['Idempotent-Replayed'], 'true')
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_anonymous_clients_do_not_share_keys(self):
+        from django.contrib.auth.models import User
+        from appointments.models import IdempotencyKey
+        url = reverse('user-register')
+        self.client.defaults.pop('HTTP_AUTHORIZATION')
+        for n, address in enumerate(['10.0.0.1', '10.0.0.2']):
+            data = {'username': f'anon{n}', 'email': f'a{n}@a.com',
+                    'password': 'abcd1234', 'password_confirm': 'abcd1234'}
+            resp = self.client.post(url, data, content_type='application/json',
+                                    HTTP_IDEMPOTENCY_KEY='signup', REMOTE_ADDR=address)
+            self.assertEqual(resp.status_code, 201)
+        self.assertEqual(User.objects.filter(username__startswith='anon').count(), 2)
+        self.assertEqual(IdempotencyKey.objects.filter(scope__startswith='user:anon:').count(), 2)
+
+    def test_validation_error_is_stored_and_registration_supported(self):
+        url = reverse('user-register')
+        data = {'username': 'dup', 'email': 'd@d.com', 'password': 'abcd1234', 'password_confirm': 'nope1234'}
+        first = self.client.post(url, data, content_type='application/json', HTTP_IDEMPOTENCY_KEY='reg')
+        self.assertEqual(first.status_code, 400)
+        second = self.client.post(url, data, content_type='application/json', HTTP_IDEMPOTENCY_KEY='reg')
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+
+class TestQueryBudget(TestCase):
+    def setUp(self):
+        import json
+        import tempfile
+        from pathlib import Path
+        self.path = Path(tempfile.mkdtemp()) / 'budgets.json'
+        self.path.write_text(json.dumps({
+            connection.vendor: {'GET doctor-list': {'queries': 1, 'ms': 10}},
+            'othervendor': {'GET health': {'queries': 1, 'ms': 10}},
+        }))
+
+    def budget(self, **env):
+        import os
+        from unittest import mock
+        from appointments.testing import CHECK_MS_ENV, UPDATE_ENV, QueryBudget
+        environ = {k: v for k, v in os.environ.items() if k not in (UPDATE_ENV, CHECK_MS_ENV)}
+        with mock.patch.dict(os.environ, {**environ, **env}, clear=True):
+            return QueryBudget(self.path)
+
+    def test_over_budget_fails(self):
+        budget = self.budget()
+        budget.check('GET doctor-list', 1, 5)
+        with self.assertRaisesMessage(AssertionError, 'ran 2 queries on'):
+            budget.check('GET doctor-list', 2, 5)
+        # budgets recorded on another database don't apply
+        with self.assertRaisesMessage(AssertionError, 'No query budget for "GET health"'):
+            budget.check('GET health', 0, 5)
+
+    def test_wall_time_is_only_checked_on_request(self):
+        from appointments.testing import CHECK_MS_ENV
+        self.budget().check('GET doctor-list', 1, 500)
+        with self.assertRaisesMessage(AssertionError, 'took 500 ms, budget is 10 ms'):
+            self.budget(**{CHECK_MS_ENV: '1'}).check('GET doctor-list', 1, 500)
+
+    def test_update_mode_rewrites_observed_budgets(self):
+        import json
+        from appointments.testing import UPDATE_ENV
+        budget = self.budget(**{UPDATE_ENV: '1'})
+        budget.check('GET doctor-list', 4, 5)
+        budget.check('GET doctor-list', 2, 5)
+        budget.check('GET health', 0, 5)
+        budget.save()
+        saved = json.loads(self.path.read_text())
+        self.assertEqual(saved[connection.vendor]['GET doctor-list']['queries'], 4)
+        self.assertEqual(saved[connection.vendor]['GET health']['queries'], 0)
+        self.assertEqual(saved['othervendor']['GET health']['queries'], 1)
+
+
+class TestAppointmentSnapshots(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from datetime import timedelta
+        from appointments.models import Appointment, Doctor
+        self.user = User.objects.create_user('snapuser', 's@t.com', 'pass1234')
+        self.doctor = Doctor.objects.create(
+            name='Before', specialization='Dermatology', email='snap@h.com', phone='555'
+        )
+        when = timezone.now() + timedelta(days=2)
+        self.appointments = [
+            Appointment.objects.create(user=self.user, doctor=self.doctor, appointment_date=when + timedelta(hours=i))
+            for i in range(3)
+        ]
+
+    def test_new_appointment_copies_names(self):
+        appointment = self.appointments[0]
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.doctor_name, 'Before')
+        self.assertEqual(appointment.doctor_specialization, 'Dermatology')
+        self.assertEqual(appointment.user_name, 'snapuser')
+
+    def test_list_reads_snapshot_columns(self):
+        resp = self.client.post(reverse('token_obtain_pair'), {
+            'username': 'snapuser', 'password': 'pass1234'
+        }, content_type='application/json')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {resp.json().get('access')}"
+        data = self.client.get(reverse('user-appointments')).json()
+        rows = data['results'] if isinstance(data, dict) else data
+        self.assertEqual({row['doctor_name'] for row in rows}, {'Before'})
+        self.assertEqual({row['user_name'] for row in rows}, {'snapuser'})
+
+    def test_renames_update_appointments(self):
+        from unittest import mock
+        from appointments import snapshots
+        from appointments.models import Appointment
+        before = {a.pk: a.updated_at for a in Appointment.objects.all()}
+        self.doctor.name = 'After'
+        self.doctor.specialization = 'Neurology'
+        # force more than one batch
+        with mock.patch.object(snapshots, 'SYNC_BATCH_SIZE', 2):
+            self.doctor.save()
+        self.user.username = 'renamed'
+        self.user.save()
+        for appointment in Appointment.objects.all():
+            self.assertEqual(appointment.doctor_name, 'After')
+            self.assertEqual(appointment.doctor_specialization, 'Neurology')
+            self.assertEqual(appointment.user_name, 'renamed')
+            self.assertGreater(appointment.updated_at, before[appointment.pk])
+
+    def test_verify_command_detects_and_fixes_drift(self):
+        from io import StringIO
+        from django.core.management import CommandError, call_command
+        from appointments.models import Appointment
+        from appointments.snapshots import drifted
+        call_command('verify_appointment_snapshots', stdout=StringIO())
+        # e.g. a rename done with a queryset update, which sends no signal
+        Appointment.objects.filter(pk=self.appointments[0].pk).update(doctor_name='Stale')
+        with self.assertRaises(CommandError):
+            call_command('verify_appointment_snapshots', stdout=StringIO())
+        out = StringIO()
+        call_command('verify_appointment_snapshots', '--fix', stdout=out)
+        self.assertIn('Fixed 1', out.getvalue())
+        self.assertFalse(drifted().exists())
+
+
+@override_settings(HEALTH_DETAIL_TOKEN='probe-secret')
+class TestHealthProbes(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        from appointments.health import readiness_probe
+        readiness_probe.reset()
+        self.addCleanup(readiness_probe.reset)
+        self.client.defaults['HTTP_X_HEALTH_TOKEN'] = 'probe-secret'
+
+    def test_liveness_touches_nothing(self):
+        resp = self.client.get(reverse('health-live'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {'status': 'ok'})
+
+    def test_readiness_reports_each_check(self):
+        resp = self.client.get(reverse('health-ready'))
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['status'], 'ok')
+        self.assertEqual(set(data['checks']), {'database', 'connections', 'migrations', 'cache'})
+        self.assertIn('latency_ms', data['checks']['database'])
+        self.assertEqual(data['checks']['migrations']['pending'], [])
+        if connection.vendor != 'postgresql':
+            # no pool to report on
+            self.assertIsNone(data['checks']['connections']['saturation'])
+
+    def test_anonymous_readiness_is_status_only(self):
+        from unittest import mock
+        from django.db import OperationalError
+        from appointments import health
+        del self.client.defaults['HTTP_X_HEALTH_TOKEN']
+        self.assertEqual(self.client.get(reverse('health-ready')).json(), {'status': 'ok'})
+        health.readiness_probe.reset()
+        failing = mock.Mock(side_effect=OperationalError('could not connect to server "db.internal"'))
+        with mock.patch.dict(health.readiness_probe.checks, {'database': failing}), \
+                self.assertLogs('appointments.health', 'WARNING') as logs:
+            resp = self.client.get(reverse('health-ready'), HTTP_X_HEALTH_TOKEN='wrong')
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.json(), {'status': 'unavailable'})
+        self.assertIn('db.internal', logs.output[0])
+
+    def test_probes_get_last_report_while_a_check_runs(self):
+        import threading
+        from unittest import mock
+        from appointments import health
+        probe = health.ReadinessProbe({'database': lambda: {'ok': True}})
+        first = probe.run()
+        started, release = threading.Event(), threading.Event()
+
+        def hung_check():
+            started.set()
+            release.wait(5)
+            return {'ok': False}
+
+        probe.checks = {'database': hung_check}
+        with self.settings(HEALTH_READINESS_CACHE_SECONDS=0), self.assertLogs('appointments.health', 'WARNING'):
+            refresh = threading.Thread(target=probe.run)
+            refresh.start()
+            started.wait(5)
+            # the check is stuck; other probes don't queue behind it
+            with mock.patch.object(probe, '_check', side_effect=AssertionError('checked twice')):
+                self.assertIs(probe.run(), first)
+            release.set()
+            refresh.join(5)
+        self.assertEqual(probe._result['status'], 'unavailable')
+
+    @skipUnless(connection.vendor == 'postgresql', 'reads pg_stat_activity')
+    def test_connections_count_client_slots_only(self):
+        from appointments.health import check_connections
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT current_setting('max_connections')::int,"
+                " current_setting('superuser_reserved_connections')::int,"
+                " count(*) FROM pg_stat_activity"
+            )
+            max_connections, reserved, every_backend = cursor.fetchone()
+        result = check_connections()
+        self.assertEqual(result['max'], max_connections - reserved)
+        # this test's own connection counts; background workers don't
+        self.assertGreaterEqual(result['in_use'], 1)
+        self.assertLess(result['in_use'], every_backend)
+
+    def test_readiness_is_cached(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.get(reverse('health-ready'))
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('health-ready'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(queries), 0)
+
+    def test_failing_check_returns_503(self):
+        from unittest import mock
+        from django.db import OperationalError
+        from appointments import health
+        with mock.patch.object(health, 'check_database', side_effect=OperationalError('connection refused')), \
+                mock.patch.dict(health.readiness_probe.checks, {'database': health.check_database}), \
+                self.assertLogs('appointments.health', 'WARNING'):
+            resp = self.client.get(reverse('health-ready'))
+        self.assertEqual(resp.status_code, 503)
+        data = resp.json()
+        self.assertEqual(data['status'], 'unavailable')
+        self.assertEqual(data['checks']['database'], {
+            'ok': False, 'error': 'connection refused',
+            'duration_ms': data['checks']['database']['duration_ms'],
+        })
+
+    def test_slow_database_is_not_ready(self):
+        with self.settings(HEALTH_DB_LATENCY_MS=-1), self.assertLogs('appointments.health', 'WARNING'):
+            resp = self.client.get(reverse('health-ready'))
+        self.assertEqual(resp.status_code, 503)
+        self.assertFalse(resp.json()['checks']['database']['ok'])
+
+
+class TestAppointmentAdmin(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from appointments.models import Doctor
+        self.admin = User.objects.create_superuser('siteadmin', 'sa@t.com', 'pass1234')
+        self.patient = User.objects.create(username='adminpatient')
+        self.doctor = Doctor.objects.create(name='Listed', specialization='ENT', email='l@h.com', phone='666')
+        self.client.force_login(self.admin)
+
+    def book(self, count, **kwargs):
+        from datetime import timedelta
+        from django.utils import timezone
+        from appointments.models import Appointment
+        now = timezone.now()
+        Appointment.objects.bulk_create([
+            Appointment(
+                user=self.patient, doctor=self.doctor, appointment_date=now + timedelta(days=i - count // 2, hours=12),
+                doctor_name=self.doctor.name, doctor_specialization=self.doctor.specialization,
+                user_name=self.patient.username, **kwargs,
+            )
+            for i in range(count)
+        ])
+
+    def changelist(self, query=''):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('admin:appointments_appointment_changelist') + query)
+        self.assertEqual(resp.status_code, 200)
+        return resp, len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.book(3)
+        _, few = self.changelist()
+        self.book(60)
+        resp, many = self.changelist()
+        self.assertEqual(few, many)
+        self.assertContains(resp, 'adminpatient')
+
+    def test_date_filter_uses_ranges(self):
+        self.book(10)
+        resp, _ = self.changelist('?when=upcoming')
+        self.assertEqual(resp.context['cl'].result_count, 5)
+        resp, _ = self.changelist('?when=past')
+        self.assertEqual(resp.context['cl'].result_count, 5)
+
+    def test_estimated_count_only_for_large_unfiltered_tables(self):
+        from unittest import mock
+        from appointments.admin import EstimatedCountPaginator
+        from appointments.models import Appointment
+        self.book(4)
+        with mock.patch.object(EstimatedCountPaginator, 'estimate', return_value=5_000_000):
+            self.assertEqual(EstimatedCountPaginator(Appointment.objects.all(), 100).count, 5_000_000)
+        with mock.patch.object(EstimatedCountPaginator, 'estimate', return_value=10):
+            self.assertEqual(EstimatedCountPaginator(Appointment.objects.all(), 100).count, 4)
+        estimate = EstimatedCountPaginator(Appointment.objects.all(), 100).estimate()
+        if connection.vendor == 'postgresql':
+            # reltuples; -1 until the table is first vacuumed or analyzed
+            self.assertIsInstance(estimate, int)
+        else:
+            self.assertIsNone(estimate)
+        # filtered querysets are always counted
+        filtered = Appointment.objects.filter(status='Pending')
+        self.assertIsNone(EstimatedCountPaginator(filtered, 100).estimate())
+        self.assertEqual(EstimatedCountPaginator(filtered, 100).count, 4)
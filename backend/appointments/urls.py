@@ -9,6 +9,12 @@ from .views import (
     UserAppointmentsView,
     AppointmentAdminListView,
     AppointmentAdminDetailView,
+    WaitlistListCreateView,
+    WaitlistDetailView,
+    CalendarFeedView,
+    DoctorCalendarLinkView,
+    UserCalendarLinkView,
+    UtilizationAnalyticsView,
 )
 
 urlpatterns = [
@@ -20,13 +26,23 @@ urlpatterns = [
     # admin-only doctor endpoints
     path('doctors/create/', DoctorCreateView.as_view(), name='doctor-create'),
     path('doctors/<int:pk>/', DoctorDetailView.as_view(), name='doctor-detail'),
+    path('doctors/<int:pk>/calendar/', DoctorCalendarLinkView.as_view(), name='doctor-calendar'),
     
     # Appointments for regular users
     path('appointments/', AppointmentListCreateView.as_view(), name='appointment-list-create'),
     path('appointments/<int:pk>/', AppointmentDetailView.as_view(), name='appointment-detail'),
     path('my-appointments/', UserAppointmentsView.as_view(), name='user-appointments'),
+    path('my-appointments/calendar/', UserCalendarLinkView.as_view(), name='user-calendar'),
+
+    # iCalendar feeds, authorised by the signed token in the URL
+    path('calendar/<str:token>.ics', CalendarFeedView.as_view(), name='calendar-feed'),
+
+    # Waitlist for freed slots
+    path('waitlist/', WaitlistListCreateView.as_view(), name='waitlist-list-create'),
+    path('waitlist/<int:pk>/', WaitlistDetailView.as_view(), name='waitlist-detail'),
     
     # admin-only appointment endpoints
     path('admin/appointments/', AppointmentAdminListView.as_view(), name='admin-appointment-list'),
     path('admin/appointments/<int:pk>/', AppointmentAdminDetailView.as_view(), name='admin-appointment-detail'),
+    path('admin/analytics/utilization/', UtilizationAnalyticsView.as_view(), name='admin-utilization'),
 ]
@@ -1,9 +1,14 @@
 from rest_framework import generics, status, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth.models import User
-from rest_framework_simplejwt.views import TokenObtainPairView
-from .models import Doctor, Appointment
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenViewBase
+from .models import Doctor, Appointment, WaitlistEntry
 from .serializers import (
     UserRegistrationSerializer, 
     DoctorSerializer, 
@@ -11,7 +16,34 @@ from .serializers import (
     AppointmentCreateSerializer,
     AppointmentAdminSerializer,
     CustomTokenObtainPairSerializer,
+    RotatingTokenRefreshSerializer,
+    TokenRevokeSerializer,
+    WaitlistEntrySerializer,
 )
+# only what class definitions need is imported here; the calendar and waitlist
+# modules load on first use, keeping them out of worker startup
+from .idempotency import IdempotentCreateMixin
+
+
+def reserve_slot(doctor, slot, appointment=None):
+    """Lock ``doctor`` and fail with 400 if another booked appointment holds
+    ``slot``.  Call inside the transaction that books or moves into it."""
+    from .waitlist import lock_doctor, slot_taken
+    lock_doctor(doctor)
+    if slot_taken(doctor, slot, exclude=appointment):
+        raise ValidationError({'appointment_date': ['This slot is already booked.']})
+
+
+def reserve_updated_slot(serializer):
+    """``reserve_slot`` before saving an appointment update that makes it hold
+    a slot it didn't before: a new date or doctor, or no longer rejected."""
+    instance, data = serializer.instance, serializer.validated_data
+    if data.get('status', instance.status) == 'Rejected':
+        return
+    doctor = data.get('doctor', instance.doctor)
+    slot = data.get('appointment_date', instance.appointment_date)
+    if instance.status == 'Rejected' or doctor != instance.doctor or slot != instance.appointment_date:
+        reserve_slot(doctor, slot, instance)
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -19,7 +51,17 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
-class UserRegistrationView(generics.CreateAPIView):
+class RotatingTokenRefreshView(TokenRefreshView):
+    """Refresh an access token, rotating (and revoking) the refresh token."""
+    serializer_class = RotatingTokenRefreshSerializer
+
+
+class TokenRevokeView(TokenViewBase):
+    """Revoke a refresh token so it cannot be used again (logout)."""
+    serializer_class = TokenRevokeSerializer
+
+
+class UserRegistrationView(IdempotentCreateMixin, generics.CreateAPIView):
     """API view for user registration."""
     queryset = User.objects.all()
     permission_classes = [permissions.AllowAny]
@@ -45,7 +87,7 @@ class DoctorListView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
 
 
-class DoctorCreateView(generics.CreateAPIView):
+class DoctorCreateView(IdempotentCreateMixin, generics.CreateAPIView):
     """API view for staff to create a new doctor."""
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
@@ -59,7 +101,7 @@ class DoctorDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAdminUser]
 
 
-class AppointmentListCreateView(generics.ListCreateAPIView):
+class AppointmentListCreateView(IdempotentCreateMixin, generics.ListCreateAPIView):
     """API view to list and create appointments for regular users."""
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -74,8 +116,10 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
         return Appointment.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        # Automatically set the user to the logged-in user
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            reserve_slot(serializer.validated_data['doctor'], serializer.validated_data['appointment_date'])
+            # Automatically set the user to the logged-in user
+            serializer.save(user=self.request.user)
 
 
 class AppointmentAdminListView(generics.ListAPIView):
@@ -91,6 +135,24 @@ class AppointmentAdminDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AppointmentAdminSerializer
     permission_classes = [permissions.IsAdminUser]
 
+    def perform_update(self, serializer):
+        from .waitlist import promote_from_waitlist
+        # rejecting an appointment frees its slot for the waitlist; un-rejecting
+        # or moving one needs the slot to still be free
+        with transaction.atomic():
+            previous_status = serializer.instance.status
+            reserve_updated_slot(serializer)
+            appointment = serializer.save()
+            if appointment.status == 'Rejected' and previous_status != 'Rejected':
+                promote_from_waitlist(appointment.doctor, appointment.appointment_date)
+
+    def perform_destroy(self, instance):
+        from .waitlist import promote_from_waitlist
+        with transaction.atomic():
+            instance.delete()
+            if instance.status != 'Rejected':
+                promote_from_waitlist(instance.doctor, instance.appointment_date)
+
 
 class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
     """API view to retrieve, update, or delete an appointment."""
@@ -101,6 +163,101 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
         # Only allow users to access their own appointments
         return Appointment.objects.filter(user=self.request.user)
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            reserve_updated_slot(serializer)
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        from .waitlist import promote_from_waitlist
+        # a cancelled appointment frees its slot for the waitlist
+        with transaction.atomic():
+            instance.delete()
+            if instance.status != 'Rejected':
+                promote_from_waitlist(instance.doctor, instance.appointment_date)
+
+
+class CalendarFeedView(APIView):
+    """iCalendar feed addressed by a signed token.  Calendar clients subscribe
+    to the URL and can't send credentials, so the token is the only check.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, token):
+        from .ics import calendar_response, feed_for_token
+        feed = feed_for_token(token)
+        if feed is None:
+            raise Http404
+        appointments, name = feed
+        return calendar_response(request, appointments, name)
+
+
+def calendar_link(request, key):
+    """Subscription URLs (``https://`` and ``webcal://``) for a feed key."""
+    from .ics import feed_token
+    if key is None:
+        # nothing issued yet; POST to create the first URL
+        raise Http404
+    url = request.build_absolute_uri(reverse('calendar-feed', args=[feed_token(key)]))
+    return Response({'url': url, 'webcal_url': 'webcal://' + url.split('://', 1)[1]})
+
+
+class DoctorCalendarLinkView(APIView):
+    """Subscription URL for a doctor's schedule (admin only), e.g. to hand to
+    the doctor.  GET returns the current URL; POST issues a new one and
+    revokes all earlier URLs."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pk):
+        from .ics import feed_key
+        return calendar_link(request, feed_key(doctor=get_object_or_404(Doctor, pk=pk)))
+
+    def post(self, request, pk):
+        from .ics import rotate_feed_key
+        return calendar_link(request, rotate_feed_key(doctor=get_object_or_404(Doctor, pk=pk)))
+
+
+class UserCalendarLinkView(APIView):
+    """Subscription URL for the current user's appointments.  GET returns the
+    current URL; POST issues a new one and revokes all earlier URLs."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        from .ics import feed_key
+        return calendar_link(request, feed_key(user=request.user))
+
+    def post(self, request):
+        from .ics import rotate_feed_key
+        return calendar_link(request, rotate_feed_key(user=request.user))
+
+
+class UtilizationAnalyticsView(APIView):
+    """Utilization, peak hours and availability gaps per doctor and
+    specialization (admin only).  Optional ``start``/``end`` query parameters
+    are ISO dates; ``end`` is exclusive.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        # NumPy is only needed here, keep it out of worker startup
+        from datetime import date
+        from . import analytics
+
+        start, end = analytics.default_range()
+        try:
+            if 'start' in request.query_params:
+                start = date.fromisoformat(request.query_params['start'])
+            if 'end' in request.query_params:
+                end = date.fromisoformat(request.query_params['end'])
+        except ValueError:
+            return Response({'detail': 'start and end must be dates (YYYY-MM-DD)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not start < end or end - start > analytics.MAX_RANGE:
+            return Response({'detail': 'end must be after start and within 3 years of it'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(analytics.utilization_report(start, end))
+
 
 class UserAppointmentsView(APIView):
     """API view to get current user's all appointments."""
@@ -110,3 +267,24 @@ class UserAppointmentsView(APIView):
         appointments = Appointment.objects.filter(user=request.user)
         serializer = AppointmentSerializer(appointments, many=True)
         return Response(serializer.data)
+
+
+class WaitlistListCreateView(generics.ListCreateAPIView):
+    """List the current user's waitlist entries or join a doctor's waitlist."""
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(user=self.request.user).select_related('doctor')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class WaitlistDetailView(generics.RetrieveDestroyAPIView):
+    """Retrieve or leave one of the current user's waitlist entries."""
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(user=self.request.user).select_related('doctor')
@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Appointment, Doctor, WaitlistEntry
+
+
+def lock_doctor(doctor):
+    """Serialise everything that decides who holds a slot with ``doctor`` (new
+    bookings, slot changes and promotions) until the current transaction ends.
+
+    ``FOR NO KEY UPDATE`` only conflicts with itself and stronger locks, not
+    with the ``FOR KEY SHARE`` lock every INSERT referencing the doctor
+    takes, so it doesn't stall unrelated writes.
+    """
+    list(Doctor.objects.select_for_update(no_key=True).filter(pk=doctor.pk).values_list('pk', flat=True))
+
+
+def slot_taken(doctor, slot, exclude=None):
+    """Whether a booked (not rejected) appointment other than ``exclude``
+    holds ``slot``.  Only reliable under ``lock_doctor``."""
+    appointments = Appointment.objects.filter(doctor=doctor, appointment_date=slot).exclude(status='Rejected')
+    if exclude is not None:
+        appointments = appointments.exclude(pk=exclude.pk)
+    return appointments.exists()
+
+
+def promote_from_waitlist(doctor, slot):
+    """Give a freed ``slot`` with ``doctor`` to the best waiting entry.
+
+    The next entry is taken from the waitlist queue index (highest priority,
+    then oldest) among entries whose window covers the slot.  The entry row is
+    locked with ``SKIP LOCKED`` so concurrent cancellations never hand the
+    same waiter two slots, and the doctor is locked first (``lock_doctor``)
+    so promotions and bookings with the same doctor decide one at a time.
+    Entries whose window has passed are marked expired on the way, so they
+    drop out of the queue index.  Returns the new appointment, or ``None``
+    when the slot is in the past, already re-booked or nobody is waiting for it.
+
+    Callers should already be inside the transaction that freed the slot; the
+    atomic block below only makes the promotion itself all-or-nothing.
+    """
+    now = timezone.now()
+    if slot < now:
+        return None
+
+    with transaction.atomic():
+        # held until the caller commits: otherwise two releases of the same
+        # slot (or a cancel racing a booking) could each miss the other's not
+        # yet committed appointment and book the slot twice
+        lock_doctor(doctor)
+        if slot_taken(doctor, slot):
+            return None
+
+        WaitlistEntry.objects.filter(
+            doctor=doctor, status=WaitlistEntry.WAITING, window_end__lt=now
+        ).update(status=WaitlistEntry.EXPIRED)
+        entry = (
+            WaitlistEntry.objects
+            # the user is joined for the appointment's name snapshot but not locked
+            .select_related('user')
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(
+                doctor=doctor,
+                status=WaitlistEntry.WAITING,
+                window_start__lte=slot,
+                window_end__gte=slot,
+            )
+            .order_by('-priority', 'created_at', 'id')
+            .first()
+        )
+        if entry is None:
+            return None
+
+        appointment = Appointment.objects.create(
+            user=entry.user, doctor=doctor, appointment_date=slot
+        )
+        entry.status = WaitlistEntry.PROMOTED
+        entry.appointment = appointment
+        entry.save(update_fields=['status', 'appointment'])
+        return appointment
@@ -6,6 +6,8 @@ from pathlib import Path
 from datetime import timedelta
 import os
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -132,9 +134,10 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
-    'ROTATE_REFRESH_TOKENS': False,
+    'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login is buffered and written in batches, see LAST_LOGIN_FLUSH_* below
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -142,7 +145,61 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Refresh token revocation store (see appointments/revocation.py).  Other
+# workers' revocations become visible after at most TOKEN_REVOCATION_SYNC_SECONDS.
+
+TOKEN_REVOCATION_SYNC_SECONDS = 5
+TOKEN_REVOCATION_BLOOM_CAPACITY = 100000
+TOKEN_REVOCATION_LRU_SIZE = 10000
+
+# Buffered last_login writes (see appointments/last_login.py): flush once this
+# many users are pending or this many seconds have passed since the last flush.
+# The test runner turns buffering off so every login is written immediately.
+
+LAST_LOGIN_BUFFERED = True
+LAST_LOGIN_FLUSH_SIZE = 500
+LAST_LOGIN_FLUSH_SECONDS = 10
+
+TEST_RUNNER = 'appointments.testing.TestRunner'
+
+# Idempotency-Key support on create endpoints (see appointments/idempotency.py)
+
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_CACHE_SIZE = 10000
+# a request still running after this long is treated as abandoned and its
+# key can be taken over by a retry
+IDEMPOTENCY_LEASE_SECONDS = 60
+
+# Readiness probe (see appointments/health.py): results are reused for this
+# many seconds; the worker reports 503 above these latency/saturation limits.
+HEALTH_READINESS_CACHE_SECONDS = 5
+HEALTH_DB_LATENCY_MS = 250
+HEALTH_DB_SATURATION_LIMIT = 0.9
+HEALTH_CHECK_TIMEOUT_SECONDS = 2
+# send as X-Health-Token to get the full readiness report; unset = status only
+HEALTH_DETAIL_TOKEN = os.environ.get('HEALTH_DETAIL_TOKEN')
+
+# Admin changelists using EstimatedCountPaginator (appointments/admin.py) show
+# PostgreSQL's row estimate instead of an exact COUNT(*) above this many rows.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Caches.  Rendered calendar events get their own alias so a large feed
+# fits entirely (LocMemCache's default MAX_ENTRIES is only 300); roughly
+# 300 bytes per event.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'ics': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ics-vevents',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+ICS_VEVENT_CACHE_SECONDS = 24 * 60 * 60
+
 # CORS settings
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
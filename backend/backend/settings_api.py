@@ -0,0 +1,51 @@
+"""
+API-only settings profile for the Django backend.
+
+Autoscaled API workers only serve the JSON endpoints under ``/api/``, so this
+profile removes the admin, sessions, messages and static files apps, their
+middleware and the admin URLs that ``backend.settings`` loads for the full
+site.  That skips their app setup, URL resolution and per-request middleware;
+it does not keep every such module out of memory, since Django REST
+framework's schema generator imports ``django.contrib.admindocs`` (and with it
+``django.contrib.admin`` and ``messages``) and Django's models import
+``django.forms`` and ``django.template``.  Use it through
+``backend/wsgi_api.py`` or ``DJANGO_SETTINGS_MODULE=backend.settings_api``.
+"""
+
+from .settings import *  # noqa: F401,F403,F405
+
+# apps and middleware only needed by the admin site and session based pages
+BROWSER_ONLY_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+
+BROWSER_ONLY_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in BROWSER_ONLY_APPS]
+
+MIDDLEWARE = [mw for mw in MIDDLEWARE if mw not in BROWSER_ONLY_MIDDLEWARE]
+
+# API routes only, without the admin site
+ROOT_URLCONF = 'backend.urls_api'
+
+# nothing is rendered from templates; the browsable API is disabled below
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+    ),
+}
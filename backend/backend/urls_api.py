@@ -0,0 +1,22 @@
+"""
+API URL configuration, shared by the full site and the API-only profile.
+"""
+from django.urls import path, include
+from appointments.health import liveness, readiness
+from appointments.views import CustomTokenObtainPairView, RotatingTokenRefreshView, TokenRevokeView
+
+urlpatterns = [
+    # NOTE: registration is handled via the appointments app API.
+    # A TemplateView for 'api/register/' used to live in backend/urls.py and
+    # caused POSTs to /api/register/ to return HTML instead of JSON, so it
+    # was removed.
+    path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/refresh/', RotatingTokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/revoke/', TokenRevokeView.as_view(), name='token_revoke'),
+    path('api/', include('appointments.urls')),
+    # liveness: the process answers; readiness: it can serve requests
+    # (database, migrations, cache), used by the load balancer and front‑end
+    path('api/health/', liveness, name='health'),
+    path('api/health/live/', liveness, name='health-live'),
+    path('api/health/ready/', readiness, name='health-ready'),
+]
@@ -0,0 +1,11 @@
+"""
+WSGI config for API-only workers (see ``backend/settings_api.py``).
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings_api')
+
+application = get_wsgi_application()
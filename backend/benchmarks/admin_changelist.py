@@ -0,0 +1,117 @@
+"""
+Appointment admin changelist on a large table.
+
+Seeds a test database with many appointments and renders the changelist for
+common views with the current ``AppointmentAdmin`` and with the previous
+configuration (FK columns, ``date_hierarchy``, exact counts) for comparison,
+printing the query count and time of each.
+
+Run from the ``backend`` directory::
+
+    python benchmarks/admin_changelist.py --appointments 1000000
+
+The estimated count only applies on PostgreSQL; elsewhere both admins count
+exactly.  Run ANALYZE (or let autovacuum) after seeding so ``reltuples`` is set.
+"""
+import argparse
+import random
+import time
+import warnings
+from datetime import timedelta
+
+from common import setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=200_000)
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3, help='renders per view; the best is reported')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib import admin
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+    from appointments.admin import AppointmentAdmin
+    from appointments.models import Appointment, Doctor
+
+    class PreviousAppointmentAdmin(admin.ModelAdmin):
+        list_display = ['id', 'user', 'doctor', 'appointment_date', 'status', 'created_at']
+        search_fields = ['user__username', 'doctor__name']
+        list_filter = ['status', 'appointment_date', 'created_at']
+        date_hierarchy = 'appointment_date'
+
+    with test_database():
+        rng = random.Random(0)
+        doctors = Doctor.objects.bulk_create([
+            Doctor(name=f'Doctor {i}', specialization=f'Specialization {i % 12}',
+                   email=f'd{i}@h.com', phone=str(i))
+            for i in range(args.doctors)
+        ])
+        users = User.objects.bulk_create([User(username=f'patient{i}') for i in range(args.users)])
+        now = timezone.now()
+        statuses = ['Pending', 'Approved', 'Rejected']
+        batch = []
+        for i in range(args.appointments):
+            doctor, user = rng.choice(doctors), rng.choice(users)
+            batch.append(Appointment(
+                user=user, doctor=doctor, status=rng.choice(statuses),
+                appointment_date=now + timedelta(minutes=30 * rng.randint(-365 * 48, 365 * 48)),
+                doctor_name=doctor.name, doctor_specialization=doctor.specialization, user_name=user.username,
+            ))
+            if len(batch) == 10000:
+                Appointment.objects.bulk_create(batch)
+                batch = []
+        Appointment.objects.bulk_create(batch)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(Appointment._meta.db_table)}')
+
+        superuser = User.objects.create_superuser('benchadmin', 'a@a.com', 'pass1234')
+        factory = RequestFactory()
+        # the previous admin's own date filter links use plain dates, which
+        # Django warns about as naive datetimes
+        warnings.filterwarnings('ignore', 'DateTimeField .* received a naive datetime')
+        today = timezone.localdate()
+        week = today + timedelta(days=7)
+        middle = args.appointments // AppointmentAdmin.list_per_page // 2
+        views = [
+            ('all, first page', '', ''),
+            ('all, middle page', f'?p={middle}', f'?p={middle}'),
+            ('status=Pending', '?status__exact=Pending', '?status__exact=Pending'),
+            ('next 7 days', '?when=next7',
+             f'?appointment_date__gte={today}&appointment_date__lt={week}'),
+            ('search "patient42"', '?q=patient42', '?q=patient42'),
+        ]
+
+        def render(model_admin, query):
+            request = factory.get('/admin/appointments/appointment/' + query)
+            request.user = superuser
+            best, count = None, 0
+            for _ in range(args.repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    model_admin.changelist_view(request).render()
+                    elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+                count = len(queries)
+            return count, best * 1000
+
+        current = AppointmentAdmin(Appointment, admin.site)
+        previous = PreviousAppointmentAdmin(Appointment, admin.site)
+        print(f'{args.appointments:,} appointments on {connection.vendor}')
+        print(f'{"view":<22} {"current":>22} {"previous":>22}')
+        for label, query, previous_query in views:
+            now_queries, now_ms = render(current, query)
+            old_queries, old_ms = render(previous, previous_query)
+            print(f'{label:<22} {now_queries:>4} queries {now_ms:>7.1f} ms'
+                  f' {old_queries:>4} queries {old_ms:>7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Shared setup for benchmarks that need Django and a database.
+
+Benchmarks run against a throwaway test database created from the configured
+settings (``DJANGO_SETTINGS_MODULE``, default ``backend.settings``), so they
+never touch real data.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create the test database for the duration of the block."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timed(label, fn, n):
+    """Run ``fn`` ``n`` times and print throughput.  Returns seconds per call."""
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<45} {n / elapsed:>12,.0f} ops/s  ({elapsed / n * 1e6:,.1f} us/op)')
+    return elapsed / n
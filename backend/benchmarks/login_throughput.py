@@ -0,0 +1,55 @@
+"""
+Login throughput with buffered versus per-login ``last_login`` writes.
+
+Logs users in through ``CustomTokenObtainPairSerializer`` with simplejwt's
+``UPDATE_LAST_LOGIN`` on (one UPDATE per login) and off (timestamps buffered
+in ``last_login_buffer`` and flushed in batches, as after each request).
+Passwords use the fast MD5 hasher so the comparison measures the database
+write rather than PBKDF2.
+
+Run from the ``backend`` directory::
+
+    python benchmarks/login_throughput.py --users 500 --logins 5000
+"""
+import argparse
+import itertools
+from unittest import mock
+
+from common import setup_django, test_database, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--logins', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.test import override_settings
+    from rest_framework_simplejwt.settings import api_settings
+    from appointments.last_login import last_login_buffer
+    from appointments.serializers import CustomTokenObtainPairSerializer
+
+    with test_database(), override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+        password = make_password('pass1234')
+        User.objects.bulk_create([User(username=f'login{i}', password=password) for i in range(args.users)])
+        names = itertools.cycle([f'login{i}' for i in range(args.users)])
+
+        def login():
+            serializer = CustomTokenObtainPairSerializer(data={'username': next(names), 'password': 'pass1234'})
+            serializer.is_valid(raise_exception=True)
+            # what request_finished does after every login
+            last_login_buffer.flush_if_due()
+
+        print(f'{args.logins:,} logins over {args.users:,} users')
+        with mock.patch.object(api_settings, 'UPDATE_LAST_LOGIN', True):
+            per_login = timed('UPDATE_LAST_LOGIN on (UPDATE per login)', login, args.logins)
+        buffered = timed('UPDATE_LAST_LOGIN off (buffered)', login, args.logins)
+        last_login_buffer.flush()
+        print(f'buffered is {per_login / buffered:.2f}x the per-login throughput')
+
+
+if __name__ == '__main__':
+    main()
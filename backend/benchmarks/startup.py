@@ -0,0 +1,139 @@
+"""
+Cold start benchmark for the full site and the API-only worker profile.
+
+For each profile a fresh interpreter imports the WSGI application and serves
+one ``GET /api/health/``.  Runs of the two profiles alternate so background
+load hits both alike.  We report the median time to that first response and
+the module import time and count from ``python -X importtime``, then fail
+(exit status 1) on a regression of the API-only profile:
+
+- its first response is more than ``--max-response-ratio`` (1.25) times the
+  full site's; the profiles are close and single runs vary by tens of
+  percent, so this only catches the API profile becoming clearly slower
+- it imports more modules than the checked-in baseline
+  (``benchmarks/startup_baseline.json``) plus ``--module-slack``; the count
+  is deterministic, so this is the precise check
+
+Both checks are relative, so they hold on slow and fast machines alike.  Module
+counts depend on installed package versions; after upgrading dependencies
+rewrite the baseline with ``--update-baseline``.
+
+Run from the ``backend`` directory::
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --update-baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_FILE = Path(__file__).resolve().with_name('startup_baseline.json')
+
+# executed in a fresh interpreter: argv = [settings module, wsgi module]
+CHILD = r'''
+import time
+start = time.perf_counter()
+import importlib, io, os, sys
+os.environ['DJANGO_SETTINGS_MODULE'] = sys.argv[1]
+application = importlib.import_module(sys.argv[2]).application
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/health/', 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '8000', 'HTTP_HOST': 'localhost',
+    'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+}
+statuses = []
+body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+assert statuses[0].startswith('200'), (statuses, body)
+print((time.perf_counter() - start) * 1000)
+'''
+
+
+def run_child(settings, wsgi, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-c', CHILD, settings, wsgi]
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(BACKEND_DIR), os.environ.get('PYTHONPATH')]))}
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f'{settings} failed to serve /api/health/:\n{proc.stderr}')
+    return float(proc.stdout.strip()), proc.stderr
+
+
+def parse_importtime(stderr):
+    """Return (total self time in ms, module count, top-level cumulative times)."""
+    total_us = 0
+    modules = 0
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        modules += 1
+        # nested imports are indented under the module that triggered them
+        if not name.startswith('  '):
+            top_level.append((int(cumulative_us) / 1000, name.strip()))
+    top_level.sort(reverse=True)
+    return total_us / 1000, modules, top_level
+
+
+def report(label, settings, wsgi, timings):
+    _, stderr = run_child(settings, wsgi, importtime=True)
+    import_ms, modules, top_level = parse_importtime(stderr)
+    first_response_ms = statistics.median(timings)
+    print(f'{label}: first response {first_response_ms:.1f} ms (median of {len(timings)}), '
+          f'imports {import_ms:.1f} ms across {modules} modules')
+    for cumulative_ms, name in top_level[:5]:
+        print(f'    {cumulative_ms:8.1f} ms  {name}')
+    return first_response_ms, import_ms, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--full-settings', default='backend.settings')
+    parser.add_argument('--api-settings', default='backend.settings_api')
+    parser.add_argument('--max-response-ratio', type=float, default=1.25,
+                        help='fail if the API-only first response is slower than the full site times this')
+    parser.add_argument('--module-slack', type=int, default=10,
+                        help='modules the API-only profile may import beyond the baseline')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help=f'write the measured module counts to {BASELINE_FILE.name}')
+    args = parser.parse_args()
+
+    full_timings, api_timings = [], []
+    for _ in range(args.runs):
+        full_timings.append(run_child(args.full_settings, 'backend.wsgi')[0])
+        api_timings.append(run_child(args.api_settings, 'backend.wsgi_api')[0])
+    full_response, full_imports, full_modules = report('full site', args.full_settings, 'backend.wsgi', full_timings)
+    api_response, api_imports, api_modules = report('api-only ', args.api_settings, 'backend.wsgi_api', api_timings)
+    print(f'api-only saves {full_response - api_response:.1f} ms to first response, '
+          f'{full_imports - api_imports:.1f} ms of imports, {full_modules - api_modules} modules')
+
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps({'full_modules': full_modules, 'api_modules': api_modules}, indent=2) + '\n')
+        print(f'wrote {BASELINE_FILE.name}')
+        return
+
+    failures = []
+    if api_response > full_response * args.max_response_ratio:
+        failures.append(f'first response {api_response:.1f} ms > {args.max_response_ratio:g} x full site '
+                        f'({full_response:.1f} ms)')
+    if BASELINE_FILE.exists():
+        baseline = json.loads(BASELINE_FILE.read_text())['api_modules']
+        if api_modules > baseline + args.module_slack:
+            failures.append(f'{api_modules} modules imported, baseline is {baseline} (+{args.module_slack})')
+    if failures:
+        print('REGRESSION: ' + '; '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Refresh token throughput with the revocation store.
+
+Measures full rotating refreshes through ``RotatingTokenRefreshSerializer``
+and compares the store's revocation check with a plain indexed lookup on the
+``RevokedToken`` table, with a realistic number of already revoked tokens.
+
+Run from the ``backend`` directory::
+
+    python benchmarks/token_refresh.py --revoked 50000 --refreshes 2000
+"""
+import argparse
+import uuid
+from datetime import timedelta
+
+from common import setup_django, test_database, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--revoked', type=int, default=50000, help='revoked tokens already in the table')
+    parser.add_argument('--refreshes', type=int, default=2000)
+    parser.add_argument('--checks', type=int, default=50000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from appointments.models import RevokedToken
+    from appointments.revocation import revocation_store
+    from appointments.serializers import CustomTokenObtainPairSerializer, RotatingTokenRefreshSerializer
+
+    with test_database():
+        expires = timezone.now() + timedelta(days=1)
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=uuid.uuid4().hex, expires_at=expires) for _ in range(args.revoked)],
+            batch_size=5000,
+        )
+        revocation_store.reset()
+        user = User.objects.create_user('bench', 'b@b.com', 'pass1234')
+        token = [str(CustomTokenObtainPairSerializer.get_token(user))]
+
+        def rotate():
+            serializer = RotatingTokenRefreshSerializer(data={'refresh': token[0]})
+            serializer.is_valid(raise_exception=True)
+            token[0] = serializer.validated_data['refresh']
+
+        print(f'{args.revoked:,} revoked tokens in the table')
+        timed('rotating refresh (serializer)', rotate, args.refreshes)
+
+        unknown = [uuid.uuid4().hex for _ in range(args.checks)]
+        store_check = iter(unknown).__next__
+        db_check = iter(unknown).__next__
+        timed('is_revoked via bloom/LRU store',
+              lambda: revocation_store.is_revoked(store_check()), args.checks)
+        timed('is_revoked via indexed table lookup',
+              lambda: RevokedToken.objects.filter(jti=db_check()).exists(), args.checks)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Utilization analytics at scale, end to end.
+
+Seeds a test database with a year of appointments (1M by default) for a
+set of doctors and times ``utilization_report`` as the API runs it: loading
+the rows into arrays, then ``compute_utilization``.  For comparison the
+load is also timed the row-by-row way (a ``datetime`` per row converted with
+``.timestamp()``).
+
+Run from the ``backend`` directory::
+
+    python benchmarks/utilization.py --appointments 200000 --doctors 50
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from common import setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=1_000_000)
+    parser.add_argument('--doctors', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from appointments.analytics import (
+        _aware, compute_utilization, load_appointments, load_doctors, utilization_report,
+    )
+    from appointments.models import Appointment, Doctor
+
+    start = date(2030, 1, 7)
+    end = start + timedelta(weeks=52)
+
+    with test_database():
+        rng = random.Random(0)
+        doctors = Doctor.objects.bulk_create([
+            Doctor(name=f'Doctor {i}', specialization=f'Specialization {i % 12}',
+                   email=f'd{i}@h.com', phone=str(i),
+                   available_days=','.join(str(d) for d in range(7) if rng.random() < 0.7))
+            for i in range(args.doctors)
+        ])
+        user = User.objects.create(username='patient')
+        first = _aware(start)
+        slots = (end - start).days * 48
+        batch = []
+        for _ in range(args.appointments):
+            doctor = rng.choice(doctors)
+            batch.append(Appointment(
+                user=user, doctor=doctor, appointment_date=first + timedelta(minutes=30 * rng.randrange(slots)),
+                doctor_name=doctor.name, doctor_specialization=doctor.specialization, user_name=user.username,
+            ))
+            if len(batch) == 10000:
+                Appointment.objects.bulk_create(batch)
+                batch = []
+        Appointment.objects.bulk_create(batch)
+        print(f'{args.appointments:,} appointments, {args.doctors} doctors, 52 weeks')
+
+        def run(label, fn):
+            began = time.perf_counter()
+            result = fn()
+            print(f'{label:<38} {(time.perf_counter() - began) * 1000:>10.1f} ms')
+            return result
+
+        appointments = run('load_appointments (epoch in SQL)', lambda: load_appointments(start, end))
+        doctor_arrays = run('load_doctors', load_doctors)
+        run('compute_utilization', lambda: compute_utilization(appointments, doctor_arrays, start, end))
+        run('utilization_report (end to end)', lambda: utilization_report(start, end))
+
+        def row_by_row():
+            rows = (
+                Appointment.objects
+                .filter(appointment_date__gte=_aware(start), appointment_date__lt=_aware(end))
+                .exclude(status='Rejected')
+                .values_list('doctor_id', 'appointment_date')
+                .iterator(chunk_size=20000)
+            )
+            return [(doctor_id, when.timestamp()) for doctor_id, when in rows]
+
+        run('row-by-row load (datetime per row)', row_by_row)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import queryCache from './queryCache';
 
 // base URL for API requests. In development we proxy `/api` through Vite
 // so the frontend can talk to the Django backend without CORS or needing to
@@ -41,12 +42,21 @@ api.interceptors.response.use(
   }
 );
 
+// Run a mutation, then drop cached reads under `prefixes` once it succeeds.
+const mutate = (request, ...prefixes) =>
+  request.then((response) => {
+    queryCache.invalidate(...prefixes);
+    return response;
+  });
+
 // Auth API
 export const authAPI = {
   register: (userData) => api.post('/register/', userData),
   login: async (credentials) => {
     const response = await api.post('/token/', credentials);
     if (response.data.access) {
+      // cached appointments belong to whoever was logged in before
+      queryCache.clear();
       localStorage.setItem('token', response.data.access);
       localStorage.setItem('refresh_token', response.data.refresh);
       // username and flags included by custom serializer
@@ -63,35 +73,52 @@ export const authAPI = {
     return response;
   },
   logout: () => {
+    // revoke the refresh token server-side so it can't be reused; this is
+    // fire-and-forget, local state is cleared either way
+    const refresh = localStorage.getItem('refresh_token');
+    const revoked = refresh
+      ? api.post('/token/revoke/', { refresh }).catch(() => {})
+      : Promise.resolve();
     localStorage.removeItem('token');
     localStorage.removeItem('refresh_token');
     localStorage.removeItem('username');
     localStorage.removeItem('is_staff');
     localStorage.removeItem('is_superuser');
+    queryCache.clear();
+    return revoked;
   },
 };
 
 // Doctors API
+// reads are served from `queryCache`; a doctor change also invalidates
+// appointments, which carry the doctor's name
 export const doctorsAPI = {
-  getAll: () => api.get('/doctors/'),
-  getById: (id) => api.get(`/doctors/${id}/`),
-  create: (data) => api.post('/doctors/create/', data),
-  update: (id, data) => api.patch(`/doctors/${id}/`, data),
-  delete: (id) => api.delete(`/doctors/${id}/`),
+  getAll: () => queryCache.fetch('doctors:list', () => api.get('/doctors/')),
+  getById: (id) => queryCache.fetch(`doctors:${id}`, () => api.get(`/doctors/${id}/`)),
+  create: (data) => mutate(api.post('/doctors/create/', data), 'doctors'),
+  update: (id, data) => mutate(api.patch(`/doctors/${id}/`, data), 'doctors', 'appointments'),
+  delete: (id) => mutate(api.delete(`/doctors/${id}/`), 'doctors', 'appointments'),
 };
 
 // Appointments API
 export const appointmentsAPI = {
-  create: (appointmentData) => api.post('/appointments/', appointmentData),
-  getAll: () => api.get('/appointments/'),
-  getMyAppointments: () => api.get('/my-appointments/'),
-  getById: (id) => api.get(`/appointments/${id}/`),
-  update: (id, data) => api.patch(`/appointments/${id}/`, data),
-  delete: (id) => api.delete(`/appointments/${id}/`),
+  create: (appointmentData) => mutate(api.post('/appointments/', appointmentData), 'appointments'),
+  getAll: () => queryCache.fetch('appointments:list', () => api.get('/appointments/')),
+  getMyAppointments: () => queryCache.fetch('appointments:mine', () => api.get('/my-appointments/')),
+  getById: (id) => queryCache.fetch(`appointments:${id}`, () => api.get(`/appointments/${id}/`)),
+  update: (id, data) => mutate(api.patch(`/appointments/${id}/`, data), 'appointments'),
+  delete: (id) => mutate(api.delete(`/appointments/${id}/`), 'appointments'),
 
-  // admin endpoints
+  // admin endpoints; the admin list is always fetched fresh
   adminList: () => api.get('/admin/appointments/'),
-  adminUpdate: (id, data) => api.patch(`/admin/appointments/${id}/`, data),
+  adminUpdate: (id, data) => mutate(api.patch(`/admin/appointments/${id}/`, data), 'appointments'),
+};
+
+// Health API
+// readiness (database, migrations, cache) rather than bare liveness; one
+// probe is shared by every component using useBackendStatus
+export const healthAPI = {
+  check: () => queryCache.fetch('health', () => api.get('/health/ready/'), { staleTime: 15 * 1000, maxAge: 15 * 1000 }),
 };
 
 export default api;
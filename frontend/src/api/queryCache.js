@@ -0,0 +1,73 @@
+// Small in-memory cache for GET requests made through the API layer.
+//
+// - concurrent calls for the same key share one in-flight request
+// - a response younger than `staleTime` is returned without a request
+// - a response younger than `maxAge` is returned immediately while a
+//   background request refreshes it for the next caller (stale-while-revalidate)
+// - anything older, or invalidated by a mutation, is fetched again
+//
+// Failed requests are never cached.  Entries are keyed by strings such as
+// `doctors:list`; `invalidate('doctors')` drops every key under that prefix,
+// including any request still in flight, whose response is then not stored.
+
+const DEFAULT_STALE_TIME = 30 * 1000;
+const DEFAULT_MAX_AGE = 5 * 60 * 1000;
+
+export function createQueryCache() {
+  const entries = new Map();
+
+  const load = (key, fetcher) => {
+    const entry = entries.get(key) || {};
+    if (entry.inflight) return entry.inflight;
+    const inflight = fetcher()
+      .then((response) => {
+        // skip storing if the key was invalidated while the request ran
+        if (entries.get(key)?.inflight === inflight) {
+          entries.set(key, { response, fetchedAt: Date.now() });
+        }
+        return response;
+      })
+      .catch((error) => {
+        const current = entries.get(key);
+        if (current?.inflight === inflight) {
+          // keep serving the last good response if there was one
+          if (current.response) entries.set(key, { response: current.response, fetchedAt: current.fetchedAt });
+          else entries.delete(key);
+        }
+        throw error;
+      });
+    entries.set(key, { ...entry, inflight });
+    return inflight;
+  };
+
+  return {
+    fetch(key, fetcher, { staleTime = DEFAULT_STALE_TIME, maxAge = DEFAULT_MAX_AGE } = {}) {
+      const entry = entries.get(key);
+      if (entry?.response) {
+        const age = Date.now() - entry.fetchedAt;
+        if (age < staleTime) return Promise.resolve(entry.response);
+        if (age < maxAge) {
+          load(key, fetcher).catch(() => {});
+          return Promise.resolve(entry.response);
+        }
+      }
+      return load(key, fetcher);
+    },
+
+    invalidate(...prefixes) {
+      for (const key of [...entries.keys()]) {
+        if (prefixes.some((prefix) => key === prefix || key.startsWith(`${prefix}:`))) {
+          entries.delete(key);
+        }
+      }
+    },
+
+    clear() {
+      entries.clear();
+    },
+  };
+}
+
+const queryCache = createQueryCache();
+
+export default queryCache;
@@ -1,9 +1,11 @@
 import { useState, useEffect } from 'react';
-import api from '../api/api';
+import { healthAPI } from '../api/api';
 
-// simple hook that probes the health endpoint once and reports whether
-// the backend was reachable.  Components can use the returned values to
-// disable forms and show a persistent error message.
+// simple hook that probes the readiness endpoint once and reports whether
+// the backend can serve requests.  Components can use the returned values to
+// disable forms and show a persistent error message.  The probe is cached
+// briefly, so components mounting together (or quick navigation) share one
+// request.
 export default function useBackendStatus() {
   const [backendUp, setBackendUp] = useState(true);
   const [error, setError] = useState('');
@@ -11,11 +13,15 @@ export default function useBackendStatus() {
   useEffect(() => {
     const probe = async () => {
       try {
-        await api.get('/health/');
+        await healthAPI.check();
         setBackendUp(true);
       } catch (e) {
         setBackendUp(false);
-        setError('Unable to reach backend. Please make sure the Django server is running.');
+        if (e.response?.status === 503) {
+          setError('The backend is running but not ready (database or cache unavailable). Please try again shortly.');
+        } else {
+          setError('Unable to reach backend. Please make sure the Django server is running.');
+        }
       }
     };
     probe();
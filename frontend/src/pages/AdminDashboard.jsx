@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import api, { doctorsAPI, appointmentsAPI } from '../api/api';
+import { doctorsAPI, appointmentsAPI } from '../api/api';
 import { useNavigate } from 'react-router-dom';
 
 function AdminDashboard() {
@@ -60,7 +60,7 @@ function AdminDashboard() {
 
   const changeAppointmentStatus = async (id, status) => {
     try {
-      await api.patch(`/admin/appointments/${id}/`, { status });
+      await appointmentsAPI.adminUpdate(id, { status });
       fetchData();
     } catch (err) {
       setError('Could not update appointment');